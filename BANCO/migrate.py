@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+import os, sys, json, hashlib, argparse
+from pathlib import Path
+import psycopg2
+
+# Migrações versionadas do schema dos WORKERS (BANCO/migrations/NNNN_nome.sql).
+#   python migrate.py [up]          aplica as pendentes, cada uma na sua transação
+#   python migrate.py status        lista aplicadas/pendentes
+#   python migrate.py check-indexes índices esperados que faltam e índices nunca usados
+# As tabelas do GESTAO_WEB (clientes, cameras) continuam com o create_all do app.
+
+MIGRATIONS_DIR = Path(os.environ.get("MIGRATIONS_DIR", Path(__file__).resolve().parent / "migrations"))
+LOCK_KEY = 740_201  # pg_advisory_lock: dois migrate subindo juntos não aplicam em dobro
+
+# índices que os caminhos de acesso dos workers/UI pressupõem (tabela, índice)
+EXPECTED_INDEXES = [
+    ("det_event", "det_event_camera_ts_idx"),
+    ("assignment", "assignment_leased_until_idx"),
+    ("assignment", "assignment_worker_leased_idx"),
+]
+# alvos de ON CONFLICT: precisam de índice único com exatamente essas colunas
+CONFLICT_TARGETS = [
+    ("detection_type", ("name",)),
+    ("assignment", ("camera_id", "detection_type_id")),
+    ("camera_subscription", ("camera_id", "detection_type_id")),
+    ("det_event", ("event_id", "ts")),  # particionada: a chave de partição entra no índice
+]
+
+def log(*a): print(*a, flush=True)
+
+def connect():
+    return psycopg2.connect(os.environ["DB_URL"])
+
+def list_migrations():
+    out = []
+    for p in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        version = p.name.split("_", 1)[0]
+        if version.isdigit(): out.append((version, p))
+    return out
+
+def checksum(p:Path) -> str:
+    return hashlib.sha256(p.read_bytes()).hexdigest()
+
+def ensure_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version    TEXT PRIMARY KEY,
+            name       TEXT NOT NULL,
+            checksum   TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+
+def applied(cur) -> dict:
+    cur.execute("SELECT version, checksum FROM schema_migrations")
+    return dict(cur.fetchall())
+
+def cmd_up(conn) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_lock(%s)", (LOCK_KEY,))
+        try:
+            ensure_table(cur); conn.commit()
+            done, n = applied(cur), 0
+            for version, p in list_migrations():
+                if version in done:
+                    if done[version] != checksum(p): log(f"[AVISO] {p.name} mudou depois de aplicada")
+                    continue
+                log(f"[migrate] aplicando {p.name}")
+                try:
+                    cur.execute(p.read_text())
+                    cur.execute("INSERT INTO schema_migrations(version, name, checksum) VALUES (%s, %s, %s)", (version, p.name, checksum(p)))
+                    conn.commit(); n += 1
+                except Exception as e:
+                    conn.rollback()
+                    log(f"[ERRO] {p.name}: {e}")
+                    return 1
+            log(f"[migrate] ok: {n} aplicada(s)")
+            return 0
+        finally:
+            conn.rollback()
+            cur.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,)); conn.commit()
+
+def cmd_status(conn) -> int:
+    with conn.cursor() as cur:
+        ensure_table(cur); conn.commit()
+        done = applied(cur)
+    for version, p in list_migrations():
+        state = "pendente" if version not in done else ("ALTERADA" if done[version] != checksum(p) else "aplicada")
+        log(f"{p.name:50s} {state}")
+    return 0
+
+def cmd_check_indexes(conn) -> int:
+    report = {"missing": [], "conflict_targets_without_unique": [], "unused": []}
+    with conn.cursor() as cur:
+        cur.execute("SELECT tablename, indexname FROM pg_indexes WHERE schemaname = current_schema()")
+        have = set(cur.fetchall())
+        report["missing"] = [f"{t}.{i}" for t, i in EXPECTED_INDEXES if (t, i) not in have]
+        for tbl, cols in CONFLICT_TARGETS:
+            cur.execute("""
+                SELECT EXISTS (
+                  SELECT 1 FROM pg_index i
+                   WHERE i.indrelid = to_regclass(%s) AND i.indisunique AND i.indpred IS NULL
+                     AND (SELECT array_agg(a.attname::text ORDER BY a.attname)
+                            FROM unnest(i.indkey::int2[]) k JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k)
+                         = (SELECT array_agg(c ORDER BY c) FROM unnest(%s::text[]) c))
+            """, (tbl, list(cols)))
+            if not cur.fetchone()[0]: report["conflict_targets_without_unique"].append(f"{tbl}({', '.join(cols)})")
+        # nunca usados desde o último reset de estatísticas (PK/UNIQUE ficam de fora: garantem integridade)
+        cur.execute("""
+            SELECT s.relname, s.indexrelname, pg_relation_size(s.indexrelid)
+              FROM pg_stat_user_indexes s JOIN pg_index i ON i.indexrelid = s.indexrelid
+             WHERE s.idx_scan = 0 AND NOT i.indisunique AND NOT i.indisprimary
+             ORDER BY pg_relation_size(s.indexrelid) DESC
+        """)
+        report["unused"] = [{"index": f"{t}.{i}", "bytes": b} for t, i, b in cur.fetchall()]
+    print(json.dumps(report, indent=2))
+    return 1 if report["missing"] or report["conflict_targets_without_unique"] else 0
+
+def main():
+    ap = argparse.ArgumentParser(description="Migrações do schema dos workers.")
+    ap.add_argument("cmd", nargs="?", default="up", choices=["up", "status", "check-indexes"])
+    args = ap.parse_args()
+    conn = connect()
+    try:
+        sys.exit({"up": cmd_up, "status": cmd_status, "check-indexes": cmd_check_indexes}[args.cmd](conn))
+    finally:
+        conn.close()
+
+if __name__ == "__main__": main()
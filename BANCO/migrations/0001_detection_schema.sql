@@ -0,0 +1,70 @@
+-- Tabelas usadas pelos WORKERS (detecção, leases, parâmetros e eventos).
+-- IF NOT EXISTS: instalações antigas já têm as tabelas criadas à mão.
+
+CREATE TABLE IF NOT EXISTS detection_type (
+    id   SERIAL PRIMARY KEY,
+    name TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS assignment (
+    camera_id         INTEGER NOT NULL,
+    detection_type_id INTEGER NOT NULL REFERENCES detection_type(id),
+    worker_id         TEXT,
+    lease_until       TIMESTAMPTZ,
+    status            TEXT NOT NULL DEFAULT 'stopped',
+    updated_at        TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (camera_id, detection_type_id)
+);
+
+CREATE TABLE IF NOT EXISTS camera_subscription (
+    camera_id         INTEGER NOT NULL,
+    detection_type_id INTEGER NOT NULL REFERENCES detection_type(id),
+    params            JSONB NOT NULL DEFAULT '{}'::jsonb,
+    enabled           BOOLEAN NOT NULL DEFAULT TRUE,
+    updated_at        TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (camera_id, detection_type_id)
+);
+
+CREATE TABLE IF NOT EXISTS det_event (
+    id                BIGSERIAL PRIMARY KEY,
+    event_id          TEXT,
+    camera_id         INTEGER NOT NULL,
+    detection_type_id INTEGER NOT NULL REFERENCES detection_type(id),
+    ts                TIMESTAMPTZ NOT NULL,
+    cls               TEXT,
+    conf              REAL NOT NULL DEFAULT 0
+);
+
+-- Alvos de ON CONFLICT precisam de índice único com exatamente essas colunas.
+-- Em tabelas antigas pode já existir (PK/UNIQUE com outro nome): só cria se faltar.
+-- det_event fica de fora: o det_event legado pode ter event_id repetido (o ON CONFLICT antigo não
+-- tinha alvo) e o índice falharia; o único (event_id, ts) nasce na tabela particionada da 0003,
+-- que copia o legado com ON CONFLICT DO NOTHING.
+DO $$
+DECLARE
+  t record;
+BEGIN
+  FOR t IN SELECT * FROM (VALUES
+      ('detection_type',      ARRAY['name'],                           'detection_type_name_uq'),
+      ('assignment',          ARRAY['camera_id','detection_type_id'],  'assignment_cam_det_uq'),
+      ('camera_subscription', ARRAY['camera_id','detection_type_id'],  'camera_subscription_cam_det_uq')
+    ) AS v(tbl, cols, idx)
+  LOOP
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_index i
+         WHERE i.indrelid = t.tbl::regclass AND i.indisunique AND i.indpred IS NULL
+           AND (SELECT array_agg(a.attname::text ORDER BY a.attname)
+                  FROM unnest(i.indkey::int2[]) k JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k)
+               = (SELECT array_agg(c ORDER BY c) FROM unnest(t.cols) c)
+    ) THEN
+      EXECUTE format('CREATE UNIQUE INDEX %I ON %I (%s)', t.idx, t.tbl,
+                     (SELECT string_agg(quote_ident(c), ', ') FROM unnest(t.cols) c));
+    END IF;
+  END LOOP;
+END $$;
+
+-- Ingestão/UI: histórico de eventos por câmera em ordem de tempo.
+CREATE INDEX IF NOT EXISTS det_event_camera_ts_idx ON det_event (camera_id, ts DESC);
+
+-- Worker: retoma os próprios leases no restart (load_leases).
+CREATE INDEX IF NOT EXISTS assignment_worker_leased_idx ON assignment (worker_id) WHERE status = 'leased';
@@ -0,0 +1,21 @@
+-- Expiração de leases por prazo (lease_janitor).
+-- Índice parcial: min(lease_until) e o UPDATE de expiração só olham os leases ativos.
+CREATE INDEX IF NOT EXISTS assignment_leased_until_idx ON assignment (lease_until) WHERE status = 'leased';
+
+-- Avisa o janitor quando um prazo pode ter ficado mais cedo (lease novo ou encurtado);
+-- renovações só empurram o prazo pra frente e não acordam ninguém.
+CREATE OR REPLACE FUNCTION assignment_lease_notify() RETURNS trigger AS $$
+BEGIN
+  PERFORM pg_notify('assignment_lease', '');
+  RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER assignment_lease_notify_ins
+  AFTER INSERT ON assignment FOR EACH ROW
+  WHEN (NEW.status = 'leased')
+  EXECUTE FUNCTION assignment_lease_notify();
+
+CREATE OR REPLACE TRIGGER assignment_lease_notify_upd
+  AFTER UPDATE OF status, lease_until ON assignment FOR EACH ROW
+  WHEN (NEW.status = 'leased' AND (OLD.status IS DISTINCT FROM 'leased' OR NEW.lease_until < OLD.lease_until))
+  EXECUTE FUNCTION assignment_lease_notify();
@@ -0,0 +1,70 @@
+-- det_event particionada por dia (ts, UTC). Retenção vira DROP de partição
+-- (WORKERS/det_event_maintainer.py) em vez de DELETE linha a linha.
+-- Os dados existentes dentro da retenção são copiados para a nova tabela nesta migração.
+
+ALTER TABLE det_event RENAME TO det_event_legacy;
+ALTER INDEX IF EXISTS det_event_camera_ts_idx RENAME TO det_event_legacy_camera_ts_idx;
+ALTER INDEX IF EXISTS det_event_event_id_uq RENAME TO det_event_legacy_event_id_uq;
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'det_event_pkey' AND conrelid = 'det_event_legacy'::regclass) THEN
+    ALTER TABLE det_event_legacy RENAME CONSTRAINT det_event_pkey TO det_event_legacy_pkey;
+  END IF;
+END $$;
+
+CREATE TABLE det_event (
+    id                BIGINT GENERATED BY DEFAULT AS IDENTITY,
+    event_id          TEXT,
+    camera_id         INTEGER NOT NULL,
+    detection_type_id INTEGER NOT NULL REFERENCES detection_type(id),
+    ts                TIMESTAMPTZ NOT NULL,
+    cls               TEXT,
+    conf              REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (id, ts)
+) PARTITION BY RANGE (ts);
+
+-- em tabela particionada o índice único precisa conter a chave de partição;
+-- reentregas do mesmo evento trazem o mesmo ts, então o ON CONFLICT continua deduplicando
+CREATE UNIQUE INDEX det_event_event_id_uq ON det_event (event_id, ts);
+CREATE INDEX det_event_camera_ts_idx ON det_event (camera_id, ts DESC);
+
+-- recebe o que cair fora das partições diárias (ts muito no futuro/passado)
+CREATE TABLE det_event_default PARTITION OF det_event DEFAULT;
+
+-- cria (se faltar) a partição det_event_pYYYYMMDD que cobre [dia, dia+1) em UTC
+CREATE OR REPLACE FUNCTION det_event_ensure_partition(day date) RETURNS text AS $$
+DECLARE
+  part text := 'det_event_p' || to_char(day, 'YYYYMMDD');
+BEGIN
+  IF to_regclass(part) IS NULL THEN
+    EXECUTE format('CREATE TABLE %I PARTITION OF det_event FOR VALUES FROM (%L) TO (%L)',
+                   part, to_char(day, 'YYYY-MM-DD') || ' 00:00:00+00', to_char(day + 1, 'YYYY-MM-DD') || ' 00:00:00+00');
+  END IF;
+  RETURN part;
+END $$ LANGUAGE plpgsql;
+
+-- janela inicial = retenção (maior ia_event_retention_days das câmeras, senão 30 dias) + 7 dias à frente;
+-- o legado mais antigo já estaria vencido e não é copiado (nada de uma partição por dia desde o min(ts))
+DO $$
+DECLARE
+  keep  int;
+  since date;
+BEGIN
+  IF EXISTS (SELECT 1 FROM information_schema.columns
+              WHERE table_name = 'cameras' AND column_name = 'ia_event_retention_days') THEN
+    EXECUTE 'SELECT max(ia_event_retention_days) FROM cameras' INTO keep;
+  END IF;
+  since := GREATEST((SELECT min(ts) AT TIME ZONE 'UTC' FROM det_event_legacy)::date,
+                    (now() AT TIME ZONE 'UTC')::date - COALESCE(keep, 30));
+  PERFORM det_event_ensure_partition(d::date)
+     FROM generate_series(since, (now() AT TIME ZONE 'UTC')::date + 7, interval '1 day') AS d;
+  INSERT INTO det_event (id, event_id, camera_id, detection_type_id, ts, cls, conf)
+  SELECT id, event_id, camera_id, detection_type_id, ts, cls, conf FROM det_event_legacy
+   WHERE ts >= since::timestamp AT TIME ZONE 'UTC'
+  ON CONFLICT DO NOTHING;
+END $$;
+
+SELECT setval(pg_get_serial_sequence('det_event', 'id'),
+              GREATEST((SELECT max(id) FROM det_event), (SELECT max(id) FROM det_event_legacy), 1));
+
+DROP TABLE det_event_legacy;
@@ -0,0 +1,24 @@
+-- det_event_ensure_partition falhava para sempre se a DEFAULT já tivesse linhas do dia
+-- (maintainer parado, relógio de câmera adiantado): o CREATE ... PARTITION OF recusa a
+-- partição nova e o dia nunca é criado. Agora as linhas do dia saem da DEFAULT para uma
+-- tabela nova, que então é anexada como a partição do dia.
+CREATE OR REPLACE FUNCTION det_event_ensure_partition(day date) RETURNS text AS $$
+DECLARE
+  part text := 'det_event_p' || to_char(day, 'YYYYMMDD');
+  lo   timestamptz := day::timestamp AT TIME ZONE 'UTC';
+  hi   timestamptz := (day + 1)::timestamp AT TIME ZONE 'UTC';
+BEGIN
+  IF to_regclass(part) IS NOT NULL THEN RETURN part; END IF;
+  IF NOT EXISTS (SELECT 1 FROM det_event_default WHERE ts >= lo AND ts < hi) THEN
+    EXECUTE format('CREATE TABLE %I PARTITION OF det_event FOR VALUES FROM (%L) TO (%L)', part, lo, hi);
+    RETURN part;
+  END IF;
+  -- segura inserts na DEFAULT até o ATTACH (que confere que ela não tem mais linhas do dia)
+  LOCK TABLE det_event_default IN EXCLUSIVE MODE;
+  EXECUTE format('CREATE TABLE %I (LIKE det_event INCLUDING DEFAULTS)', part);
+  EXECUTE format('WITH moved AS (DELETE FROM det_event_default WHERE ts >= %L AND ts < %L RETURNING *)
+                  INSERT INTO %I SELECT * FROM moved', lo, hi, part);
+  EXECUTE format('ALTER TABLE det_event ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', part, lo, hi);
+  RAISE NOTICE '%: linhas movidas da det_event_default', part;
+  RETURN part;
+END $$ LANGUAGE plpgsql;
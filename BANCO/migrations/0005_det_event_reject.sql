@@ -0,0 +1,13 @@
+-- Mensagens de det.events que o ingestor não consegue gravar (JSON inválido, campo fora da faixa,
+-- linha recusada pelo banco). Ficam aqui com o erro em vez de sumir da fila; a fila det.events não
+-- tem DLX (é declarada sem argumentos por publishers e workers).
+CREATE TABLE IF NOT EXISTS det_event_reject (
+    id          BIGSERIAL PRIMARY KEY,
+    received_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    worker_id   TEXT,
+    event_id    TEXT,
+    error       TEXT NOT NULL,
+    payload     TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS det_event_reject_received_idx ON det_event_reject (received_at);
@@ -1,9 +1,33 @@
-import os, sys, pika
+import os, sys, json, pika
 BROKER_URL=os.environ["BROKER_URL"]
-conn=pika.BlockingConnection(pika.URLParameters(BROKER_URL))
-ch=conn.channel()
-q=sys.argv[1]; msg=sys.argv[2]
-ch.queue_declare(queue=q, durable=True)
-ch.basic_publish(exchange="", routing_key=q, body=msg)
-print(f"OK: publicado em {q}")
-conn.close()
+CONTROL_EXCHANGE=os.environ.get("CONTROL_EXCHANGE", "det.control")
+CONTROL_PREFIXES=("det.start", "det.stop", "det.params")
+
+def route(key, msg):
+    # det.stop / det.params sem classe: completa a routing key com o "type" da msg
+    if key in CONTROL_PREFIXES:
+        body = json.loads(msg)
+        det = body.get("type") or body.get("detection_type")
+        if not det: raise SystemExit(f"ERRO: {key} sem 'type' na msg; use {key}.<classe>")
+        key = f"{key}.{det}"
+    if key.startswith(tuple(p + "." for p in CONTROL_PREFIXES)): return CONTROL_EXCHANGE, key
+    return "", key
+
+def main():
+    if len(sys.argv) != 3: raise SystemExit("uso: publish.py <fila|routing-key> '<json>'")
+    exchange, key = route(sys.argv[1], sys.argv[2])
+    conn=pika.BlockingConnection(pika.URLParameters(BROKER_URL))
+    ch=conn.channel()
+    ch.confirm_delivery()
+    if exchange: ch.exchange_declare(exchange=exchange, exchange_type="topic", durable=True)
+    else: ch.queue_declare(queue=key, durable=True)
+    try:
+        ch.basic_publish(exchange=exchange, routing_key=key, body=sys.argv[2],
+                         properties=pika.BasicProperties(delivery_mode=2), mandatory=True)
+    except pika.exceptions.UnroutableError:
+        raise SystemExit(f"ERRO: nenhuma fila ligada a {key} em {exchange} (worker da classe já subiu?)")
+    finally:
+        conn.close()
+    print(f"OK: publicado em {key}" + (f" via {exchange}" if exchange else ""))
+
+if __name__ == "__main__": main()
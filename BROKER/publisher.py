@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+import os, sys, json, time, queue, argparse, threading, collections
+import pika
+
+# Publisher de longa duração para det.events (ou qualquer fila/exchange):
+# uma conexão SelectConnection numa thread própria, publisher confirms assíncronos,
+# envio em lotes a partir de um buffer limitado (publish() bloqueia quando enche = backpressure).
+# Msgs com nack ou em voo quando a conexão cai são reenviadas (at-least-once).
+#
+#   from publisher import EventPublisher
+#   pub = EventPublisher(); pub.publish({"camera_id": 1, ...}); pub.close()
+#
+# CLI: python publisher.py [--routing-key det.events] < eventos.ndjson
+
+BROKER_URL = os.environ.get("BROKER_URL", "")
+PROPS = pika.BasicProperties(delivery_mode=2, content_type="application/json")
+
+class PublisherClosed(Exception):
+    pass
+
+class EventPublisher:
+    def __init__(self, url:str|None=None, routing_key:str="det.events", exchange:str="",
+                 max_buffer:int=10000, batch_size:int=500, max_inflight:int=5000, declare_queue:bool=True):
+        self.params = pika.URLParameters(url or BROKER_URL)
+        self.routing_key, self.exchange = routing_key, exchange
+        self.batch_size, self.max_inflight = batch_size, max_inflight
+        self.declare_queue = declare_queue and not exchange
+        self._buf = queue.Queue(maxsize=max_buffer)
+        # estado abaixo é tocado só pela thread do ioloop
+        self._retry = collections.deque()
+        self._inflight = collections.OrderedDict()  # delivery_tag -> (routing_key, body)
+        self._tag = 0
+        self._conn = self._ch = None
+        self._stopping = False
+        self._idle = threading.Condition()
+        self._kick_lock, self._kicked = threading.Lock(), False  # já há um _drain agendado pelo publish()
+        self.stats = {"published": 0, "confirmed": 0, "nacked": 0, "republished": 0, "reconnects": 0}
+        self._thread = threading.Thread(target=self._run, name="event-publisher", daemon=True)
+        self._thread.start()
+
+    # ---- API (qualquer thread) ----
+    def publish(self, body, routing_key:str|None=None, timeout:float|None=None):
+        if self._stopping: raise PublisherClosed("publisher fechado")
+        if isinstance(body, (dict, list)): body = json.dumps(body, ensure_ascii=False)
+        if isinstance(body, str): body = body.encode("utf-8")
+        self._buf.put((routing_key or self.routing_key, body), timeout=timeout)  # queue.Full se timeout estourar
+        with self._kick_lock:
+            if self._kicked: return
+            self._kicked = True
+        conn = self._conn
+        try: conn.ioloop.add_callback_threadsafe(self._kick)
+        except Exception: self._kicked = False  # sem conexão: o _on_channel_open da próxima drena
+
+    def pending(self) -> int:
+        return self._buf.qsize() + len(self._inflight) + len(self._retry)
+
+    def flush(self, timeout:float|None=None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self.pending():
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0: return False
+                self._idle.wait(timeout=0.5 if left is None else min(0.5, left))
+        return True
+
+    def close(self, timeout:float|None=30.0) -> bool:
+        ok = self.flush(timeout)
+        self._stopping = True
+        conn = self._conn
+        if conn is not None:
+            try: conn.ioloop.add_callback_threadsafe(self._close_conn)
+            except Exception: pass
+        self._thread.join(timeout=5)
+        return ok
+
+    # ---- thread do ioloop ----
+    def _run(self):
+        while not self._stopping:
+            self._conn = pika.SelectConnection(self.params, on_open_callback=self._on_open,
+                                               on_open_error_callback=self._on_stop, on_close_callback=self._on_stop)
+            self._conn.ioloop.start()
+            self._ch = None
+            if self._stopping: break
+            # o que estava em voo não tem confirmação: reenvia na próxima conexão, na ordem
+            self._retry.extendleft(reversed(list(self._inflight.values())))
+            self.stats["republished"] += len(self._inflight)
+            self._inflight.clear()
+            self.stats["reconnects"] += 1
+            print(f"[publisher] conexão perdida; retry em 1s (pendentes={self.pending()})", file=sys.stderr, flush=True)
+            time.sleep(1)
+
+    def _on_stop(self, conn, *_):
+        conn.ioloop.stop()
+
+    def _close_conn(self):
+        if self._conn and self._conn.is_open: self._conn.close()
+        else: self._conn.ioloop.stop()
+
+    def _on_open(self, conn):
+        conn.channel(on_open_callback=self._on_channel_open)
+
+    def _on_channel_open(self, ch):
+        self._ch, self._tag = ch, 0
+        # um _kick agendado no ioloop da conexão anterior nunca vai rodar
+        with self._kick_lock: self._kicked = False
+        ch.add_on_close_callback(lambda *_: self._conn.is_open and self._conn.close())
+        ch.confirm_delivery(ack_nack_callback=self._on_confirm)
+        if self.declare_queue: ch.queue_declare(queue=self.routing_key, durable=True, callback=lambda _: self._drain())
+        else: self._drain()
+
+    def _next(self):
+        if self._retry: return self._retry.popleft()
+        try: return self._buf.get_nowait()
+        except queue.Empty: return None
+
+    # _drain roda por evento: publish() (via _kick), confirmação recebida e canal aberto.
+    # Para quando o buffer esvazia ou o limite de msgs em voo é atingido; o próximo evento retoma.
+    def _kick(self):
+        with self._kick_lock: self._kicked = False
+        self._drain()
+
+    def _drain(self):
+        ch = self._ch
+        if ch is None or not ch.is_open: return
+        sent = 0
+        with self._idle:  # flush() não pode ver a msg "entre" o buffer e _inflight
+            while sent < self.batch_size and len(self._inflight) < self.max_inflight:
+                item = self._next()
+                if item is None: break
+                self._tag += 1
+                self._inflight[self._tag] = item
+                ch.basic_publish(self.exchange, item[0], item[1], PROPS)
+                sent += 1
+        self.stats["published"] += sent
+        # lote cheio: pode haver mais no buffer; devolve o loop (confirmações) e continua
+        if sent == self.batch_size: self._conn.ioloop.call_later(0, self._drain)
+
+    def _on_confirm(self, frame):
+        m = frame.method
+        ack = isinstance(m, pika.spec.Basic.Ack)
+        if m.multiple:
+            done = []
+            while self._inflight and next(iter(self._inflight)) <= m.delivery_tag:
+                done.append(self._inflight.popitem(last=False)[1])
+        else:
+            item = self._inflight.pop(m.delivery_tag, None)
+            done = [item] if item is not None else []
+        if ack: self.stats["confirmed"] += len(done)
+        else:
+            self.stats["nacked"] += len(done)
+            self._retry.extend(done)
+        if not self.pending():
+            with self._idle: self._idle.notify_all()
+        elif done: self._drain()  # abriu espaço em voo / há nacks para reenviar
+
+def main():
+    ap = argparse.ArgumentParser(description="Publica NDJSON (stdin) no broker com publisher confirms.")
+    ap.add_argument("--routing-key", default="det.events")
+    ap.add_argument("--exchange", default="")
+    ap.add_argument("--buffer", type=int, default=10000)
+    ap.add_argument("--batch", type=int, default=500)
+    ap.add_argument("--validate", action="store_true", help="descarta linhas que não são JSON")
+    args = ap.parse_args()
+    if not BROKER_URL: raise SystemExit("ERRO: defina BROKER_URL")
+    pub = EventPublisher(routing_key=args.routing_key, exchange=args.exchange, max_buffer=args.buffer, batch_size=args.batch)
+    t0 = last = time.monotonic(); n = bad = 0
+    for line in sys.stdin.buffer:
+        line = line.strip()
+        if not line: continue
+        if args.validate:
+            try: json.loads(line)
+            except ValueError: bad += 1; continue
+        pub.publish(line)
+        n += 1
+        if time.monotonic() - last >= 5:
+            last = time.monotonic()
+            print(f"[publisher] lidas={n} confirmadas={pub.stats['confirmed']} pendentes={pub.pending()}", file=sys.stderr, flush=True)
+    ok = pub.close(timeout=60)
+    dt = max(1e-6, time.monotonic() - t0)
+    print(json.dumps({"ok": ok, "read": n, "invalid": bad, "elapsed_s": round(dt, 3), "msgs_per_s": round(n / dt, 1), **pub.stats}))
+    if not ok: sys.exit(1)
+
+if __name__ == "__main__": main()
@@ -14,6 +14,20 @@ class Settings(BaseSettings):
     app_title: str = "Sistema de Monitoramento"
     app_version: str = "3.0.0"
 
+    # Orquestração Frigate/YOLO (orchestrator.py)
+    orq_workers: int = 2            # jobs simultâneos (clientes distintos)
+    orq_job_ttl: int = 900          # segundos que um job concluído continua consultável
+    orq_status_ttl: float = 5.0     # cache do status do Frigate por cliente
+    yolo_sync_concurrency: int = 4  # câmeras sincronizadas ao mesmo tempo no websocket de sincronização
+
+    # Proxy HLS (hls_proxy.py)
+    mediamtx_hls_url: str = "http://sistema-mediamtx:8888/live"
+    hls_cache_mb: int = 64            # LRU de segmentos em memória
+    hls_playlist_ttl: float = 1.0     # .m3u8 muda a cada segmento: cache curto
+    hls_max_connections: int = 100
+    hls_connect_timeout: float = 3.0
+    hls_read_timeout: float = 15.0
+
     class Config:
         # Define o arquivo .env como fonte das variáveis de ambiente.
         env_file = ".env"
@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
-import os, re, json, shutil, subprocess
+import os, re, json, time, bisect, threading, subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
+from event_catalog import Catalog, ensure_backfill
+from work_area import job_dir, leased, atomic_write_text
 
 DEFAULT_PRE = int(os.environ.get("EVENT_PRESECONDS", "12"))
 DEFAULT_POST = int(os.environ.get("EVENT_POSTSECONDS", "12"))
 EXTRA_PAD = 2
 VERBOSE = int(os.environ.get("EVENT_VERBOSE", "1"))
+DEFAULT_JOBS = int(os.environ.get("EVENT_JOBS", str(max(1, (os.cpu_count() or 2) // 2))))
+DEFAULT_MAX_REENCODE = int(os.environ.get("EVENT_MAX_REENCODE", "1"))
+# re-encode (libx264) é caro: limitado à parte das cópias com -c copy
+REENCODE_SLOTS = threading.BoundedSemaphore(DEFAULT_MAX_REENCODE)
 
 DEFAULT_BASE_CANDIDATES = [
     "/home/edimar/SISTEMA/FRIGATE",
@@ -59,71 +67,306 @@ def recordings_dirs_for_range(uid_dir: Path, camera: str, t0: datetime, t1: date
         cur += timedelta(hours=1)
     return out
 
-def select_segments(dirs, t0: datetime, t1: datetime):
-    segs = []
-    for d in dirs: segs.extend(sorted(d.glob("*.mp4")))
-    segs.sort(key=lambda p: (p.parent.as_posix(), p.name, p.stat().st_mtime))
-    return segs
+# Frigate grava recordings/<AAAA-MM-DD>/<HH>/<camera>/<MM>.<SS>.mp4 (UTC): o início vem do caminho.
+SEG_NAME_RE = re.compile(r"^(?P<min>\d{2})\.(?P<sec>\d{2})\.mp4$")
+# corte com -c copy começa no keyframe anterior ao inpoint; acima desta sobra, re-encode
+KEYFRAME_SLACK = float(os.environ.get("EVENT_KEYFRAME_SLACK", "4"))
 
-def build_concat_and_trim(segments, out_final: Path, t_start: datetime, t_end: datetime):
-    if not segments: return False, "sem segmentos"
-    tmp_dir = out_final.parent / ".tmp_event_build"; tmp_dir.mkdir(parents=True, exist_ok=True)
-    concat_list = tmp_dir / "files.txt"
-    with concat_list.open("w") as f:
-        for seg in segments: f.write(f"file '{escape_path(seg)}'\n")
-    tmp_concat = tmp_dir / "concat.mp4"
-    rc, out = run_ffmpeg(["-f","concat","-safe","0","-i", str(concat_list), "-c","copy", str(tmp_concat)])
-    if rc != 0 or not tmp_concat.exists(): return False, f"concat falhou: {out}"
-    first_seg_start = datetime.fromtimestamp(segments[0].stat().st_mtime, tz=timezone.utc) - timedelta(seconds=EXTRA_PAD)
-    ss = max(0.0, (t_start - first_seg_start).total_seconds())
-    dur = max(0.1, (t_end - t_start).total_seconds())
-    tmp_out = tmp_dir / "tmp_cut_copy.mp4"
-    rc, out = run_ffmpeg(["-ss", f"{ss:.3f}", "-t", f"{dur:.3f}", "-i", str(tmp_concat), "-c","copy", str(tmp_out)])
-    if rc != 0 or not tmp_out.exists() or tmp_out.stat().st_size < 2000:
-        tmp_out2 = tmp_dir / "tmp_cut_reenc.mp4"
-        rc, out = run_ffmpeg(["-ss", f"{ss:.3f}", "-t", f"{dur:.3f}", "-i", str(tmp_concat), "-c:v","libx264","-preset","veryfast","-crf","20", "-c:a","aac","-movflags","+faststart", str(tmp_out2)])
-        if rc != 0 or not tmp_out2.exists(): return False, f"trim reencode falhou: {out}"
-        shutil.move(str(tmp_out2), str(out_final))
-    else:
-        shutil.move(str(tmp_out), str(out_final))
+# duração nominal do segmento do Frigate: fim do último segmento conhecido e teto para buracos na gravação
+SEGMENT_MAX = float(os.environ.get("EVENT_SEGMENT_MAX_SEC", "10"))
+INDEX_KEEP_H = int(os.environ.get("EVENT_INDEX_KEEP_H", "6"))
+
+class SegmentIndex:
+    """(uid, camera) -> segmentos ordenados por início, lidos dos nomes (sem glob/stat por evento).
+    Cada diretório de hora é listado de novo só enquanto pode receber segmentos, e só os nomes
+    novos entram; horas antigas saem da memória INDEX_KEEP_H horas antes da consulta mais recente."""
+
+    def __init__(self):
+        self._starts, self._paths = {}, {}  # chave -> [datetime] / [Path], mesmas posições
+        self._dirs = {}                     # diretório de hora -> [hora, nomes vistos, fechado]
+        self._lock = threading.Lock()
+
+    def _add(self, key, start: datetime, p: Path):
+        starts, paths = self._starts.setdefault(key, []), self._paths.setdefault(key, [])
+        i = bisect.bisect_right(starts, start)
+        starts.insert(i, start); paths.insert(i, p)
+
+    def _scan(self, key, d: Path, hour: datetime, now: datetime):
+        entry = self._dirs.setdefault(d, [hour, set(), False])
+        if entry[2]: return
+        try:
+            with os.scandir(d) as it: names = [e.name for e in it if e.name.endswith(".mp4") and e.name not in entry[1]]
+        except FileNotFoundError: return
+        for name in names:
+            p, m = d / name, SEG_NAME_RE.match(name)
+            start = hour + timedelta(minutes=int(m.group("min")), seconds=int(m.group("sec"))) if m \
+                else datetime.fromtimestamp(p.stat().st_mtime, tz=timezone.utc) - timedelta(seconds=EXTRA_PAD)
+            self._add(key, start, p); entry[1].add(name)
+        entry[2] = hour + timedelta(hours=1, seconds=2 * SEGMENT_MAX) < now
+
+    def _prune(self, key, before: datetime):
+        # por hora inteira: diretório lembrado <=> todos os seus segmentos estão no índice
+        cutoff = before.replace(minute=0, second=0, microsecond=0)
+        starts, paths = self._starts.get(key, []), self._paths.get(key, [])
+        n = bisect.bisect_left(starts, cutoff)
+        if not n: return
+        for d in {p.parent for p in paths[:n]}:
+            if d in self._dirs and self._dirs[d][0] < cutoff: del self._dirs[d]
+        del starts[:n]; del paths[:n]
+
+    def lookup(self, uid_dir: Path, camera: str, t0: datetime, t1: datetime):
+        """[(path, início, fim)] dos segmentos que cruzam [t0, t1], em ordem de tempo."""
+        key, now = (uid_dir.name, camera), datetime.now(timezone.utc)
+        with self._lock:
+            for d in recordings_dirs_for_range(uid_dir, camera, t0 - timedelta(seconds=SEGMENT_MAX), t1):
+                hour = datetime.strptime(f"{d.parent.parent.name} {d.parent.name}", "%Y-%m-%d %H").replace(tzinfo=timezone.utc)
+                self._scan(key, d, hour, now)
+            starts, paths = self._starts.get(key, []), self._paths.get(key, [])
+            out, i = [], max(0, bisect.bisect_right(starts, t0) - 1)
+            while i < len(starts) and starts[i] < t1:
+                end = starts[i] + timedelta(seconds=SEGMENT_MAX)
+                if i + 1 < len(starts): end = min(end, starts[i+1])
+                if end > t0: out.append((paths[i], starts[i], end))
+                i += 1
+            self._prune(key, t0 - timedelta(hours=INDEX_KEEP_H))
+        return out
+
+SEGMENTS = SegmentIndex()
+
+def ffprobe_duration(f: Path) -> float:
+    try:
+        out = subprocess.check_output(["ffprobe","-v","error","-show_entries","format=duration","-of","default=nw=1:nk=1",str(f)], text=True).strip()
+        return float(out)
+    except Exception: return 0.0
+
+def stream_signature(f: Path):
+    """Mesmo formato de event_merge_host.ffprobe_info: tipo:codec[:LxA] por stream, separados por |."""
     try:
-        shutil.rmtree(tmp_dir)
-    except Exception: pass
+        out = subprocess.check_output(["ffprobe","-v","error","-show_entries","stream=codec_type,codec_name,width,height","-of","json",str(f)], text=True)
+        streams = json.loads(out).get("streams", [])
+        return "|".join(f"{s.get('codec_type')}:{s.get('codec_name')}" + (f":{s['width']}x{s['height']}" if s.get("width") else "") for s in streams) or None
+    except Exception: return None
+
+def write_concat(path: Path, segments, inpoint: float = 0.0, outpoint: float = 0.0):
+    with path.open("w") as f:
+        for i, (seg, _, _) in enumerate(segments):
+            f.write(f"file '{escape_path(seg)}'\n")
+            if i == 0 and inpoint > 0: f.write(f"inpoint {inpoint:.3f}\n")
+            if i == len(segments) - 1 and outpoint > 0: f.write(f"outpoint {outpoint:.3f}\n")
+
+def extract_clip(segments, out_final: Path, t_start: datetime, t_end: datetime):
+    """Uma passada de ffmpeg: concat demuxer com inpoint/outpoint direto nos segmentos de gravação."""
+    if not segments: return False, "sem segmentos"
+    with job_dir(out_final.parent, ".tmp_event_build") as tmp_dir:
+        dur = max(0.1, (t_end - t_start).total_seconds())
+        seek = max(0.0, (t_start - segments[0][1]).total_seconds())
+        concat_list = tmp_dir / "files.txt"
+        write_concat(concat_list, segments, seek, max(0.1, (t_end - segments[-1][1]).total_seconds()))
+        tmp_out = tmp_dir / "tmp_cut_copy.mp4"
+        rc, out = run_ffmpeg(["-f","concat","-safe","0","-i", str(concat_list), "-c","copy","-avoid_negative_ts","make_zero","-movflags","+faststart", str(tmp_out)])
+        copied = rc == 0 and tmp_out.exists() and tmp_out.stat().st_size >= 2000
+        # sobra grande = inpoint longe de um keyframe; só aí vale decodificar para cortar no ponto exato
+        if copied and ffprobe_duration(tmp_out) <= dur + KEYFRAME_SLACK:
+            os.replace(tmp_out, out_final)
+        else:
+            # sem inpoint (que cai no keyframe anterior): decodifica desde o início do 1º segmento
+            # e corta na saída com -ss/-t, exato no quadro
+            full_list = tmp_dir / "files_full.txt"
+            write_concat(full_list, segments)
+            tmp_out2 = tmp_dir / "tmp_cut_reenc.mp4"
+            with REENCODE_SLOTS:
+                rc, out = run_ffmpeg(["-f","concat","-safe","0","-i", str(full_list), "-ss", f"{seek:.3f}", "-t", f"{dur:.3f}",
+                                      "-c:v","libx264","-preset","veryfast","-crf","20", "-c:a","aac","-movflags","+faststart", str(tmp_out2)])
+            if rc == 0 and tmp_out2.exists(): os.replace(tmp_out2, out_final)
+            elif copied: log(f"[AVISO] re-encode falhou, mantendo corte por keyframe: {out_final.name}"); os.replace(tmp_out, out_final)
+            else: return False, f"corte falhou: {out}"
     return True, "ok"
 
-def find_snapshots(base: Path):
+def camera_dirs(base: Path):
     for uid_dir in sorted([p for p in base.iterdir() if p.is_dir()]):
         ev = uid_dir / "events"
         if not ev.exists(): continue
         for cam_dir in sorted([p for p in ev.iterdir() if p.is_dir()]):
-            for jpg in sorted(cam_dir.glob("*.jpg")):
-                yield uid_dir, cam_dir.name, jpg
+            yield uid_dir, cam_dir
+
+def camera_snapshots(uid_dir: Path, cam_dir: Path):
+    for jpg in sorted(cam_dir.glob("*.jpg")):
+        if not jpg.with_suffix('.mp4').exists(): yield uid_dir, cam_dir.name, jpg
+
+def find_snapshots(base: Path):
+    for uid_dir, cam_dir in camera_dirs(base):
+        yield from camera_snapshots(uid_dir, cam_dir)
+
+# ---- agendador: câmeras em paralelo, cada câmera em ordem ----
+# Até `jobs` clipes ao mesmo tempo, no máximo um por câmera (os do mesmo diretório saem em ordem),
+# câmeras atendidas em rodízio. Entre instâncias, cada câmera é de quem tem o lease (work_area.py).
+# --limit conta clipes gerados: nunca há mais jobs em voo do que o que falta para o limite.
+
+def schedule(sources, fn, jobs: int, limit: int = 0, on_done=None) -> int:
+    """sources: [(chave, iterador de itens)]; fn(*item) -> True quando gerou um clipe."""
+    idle, inflight, cnt = deque(sources), {}, 0
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while True:
+            spins = len(idle)
+            while idle and spins and len(inflight) < jobs and not (limit and cnt + len(inflight) >= limit):
+                key, it = idle.popleft(); spins -= 1
+                item = next(it, None)
+                if item is None: continue  # câmera sem mais trabalho
+                inflight[pool.submit(fn, *item)] = (key, it, item)
+            if not inflight:
+                for _, it in idle:
+                    if hasattr(it, "close"): it.close()  # libera leases de câmeras não esgotadas (--limit)
+                return cnt
+            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                key, it, item = inflight.pop(fut)
+                try: ok = fut.result()
+                except Exception as e: log(f"[ERRO] {key} {item[-1]}: {e}"); ok = False
+                if ok: cnt += 1
+                if on_done: on_done(key, item, ok)
+                idle.append((key, it))
+
+def rate(n: int, seconds: float) -> float:
+    return round(n * 60.0 / seconds, 1) if seconds > 0 else 0.0
+
+def process_snapshot(uid_dir: Path, camera: str, jpg: Path, pre: int, post: int, catalog):
+    """Gera <snapshot>.mp4 + .json. None: já existia; False: sem gravação/erro; True: gerado."""
+    out_mp4 = jpg.with_suffix('.mp4'); out_json = jpg.with_suffix('.json')
+    if out_mp4.exists(): return None
+    catalog.upsert([jpg])
+    snap_ts = parse_snapshot_time(jpg)
+    t_start, t_end = snap_ts - timedelta(seconds=pre), snap_ts + timedelta(seconds=post)
+    segs = SEGMENTS.lookup(uid_dir, camera, t_start, t_end)
+    if not segs: return False
+    ok, msg = extract_clip(segs, out_mp4, t_start, t_end)
+    if not ok: log(f"[ERRO] {uid_dir.name}/{camera} {jpg.name}: {msg}"); return False
+    meta = {"unique_id": uid_dir.name, "camera": camera, "snapshot": str(jpg), "video": str(out_mp4), "created_utc": datetime.now(timezone.utc).isoformat(), "snapshot_ts_utc": snap_ts.isoformat(), "start_utc": t_start.isoformat(), "end_utc": t_end.isoformat(), "pre_s": pre, "post_s": post, "streams": stream_signature(out_mp4)}
+    atomic_write_text(out_json, json.dumps(meta, ensure_ascii=False, indent=2))
+    catalog.upsert([out_mp4, out_json])
+    log(f"[ok] gerado: {out_mp4}")
+    return True
+
+# ---- modo --watch: processo contínuo com marca d'água por câmera ----
+# Nomes de snapshot são ordenáveis por tempo: o estado guarda, por <uid>/<camera>, o último
+# snapshot já tratado; cada varredura só enfileira nomes maiores que ele (sem stat, sem glob).
+# Um snapshot só é processado depois que a janela pós-evento (--post + --settle) passou.
+# A marca só avança depois do .mp4/.json gravados e é salva com rename atômico: se o processo
+# cair, o próximo start retoma do último snapshot concluído.
+# Snapshot que falha (gravação ainda não fechada, ffmpeg com erro) volta a ser tentado com
+# backoff até EVENT_RETRY_MAX_AGE_SEC depois do snapshot; enquanto houver retentativa pendente
+# a marca da câmera não passa dela (os seguintes seguem sendo gerados normalmente).
+
+RETRY_BASE = float(os.environ.get("EVENT_RETRY_BASE_SEC", "30"))
+RETRY_MAX_AGE = float(os.environ.get("EVENT_RETRY_MAX_AGE_SEC", "1800"))
+BACKFILL_RECHECK = float(os.environ.get("EVENT_BACKFILL_RECHECK_SEC", "600"))
+
+def load_state(path: Path) -> dict:
+    try: return json.loads(path.read_text())
+    except (OSError, ValueError): return {}
+
+def save_state(path: Path, state: dict):
+    atomic_write_text(path, json.dumps(state, indent=1, sort_keys=True))
+
+def discover(base: Path, state: dict, pending: dict, room: int, floors: dict, retry: dict) -> int:
+    """Enfileira snapshots novos. `floors`: último nome já enfileirado por câmera nesta execução
+    (separado da marca salva, que fica parada enquanto houver retentativa pendente)."""
+    added = 0
+    for uid_dir in sorted(p for p in base.iterdir() if p.is_dir()):
+        ev = uid_dir / "events"
+        if not ev.is_dir(): continue
+        for cam_dir in sorted(p for p in ev.iterdir() if p.is_dir()):
+            if added >= room: return added
+            key = f"{uid_dir.name}/{cam_dir.name}"
+            dq = pending.setdefault(key, deque())
+            floor = max(floors.get(key, ""), state.get(key, ""))
+            with os.scandir(cam_dir) as it:
+                names = sorted(e.name for e in it if e.name.endswith(".jpg") and e.name > floor)
+            for name in names[:room - added]:
+                jpg = cam_dir / name
+                floors[key] = name
+                if jpg in retry.get(key, {}): continue  # já na fila de retentativa, com backoff próprio
+                dq.append((uid_dir, cam_dir.name, jpg, parse_snapshot_time(jpg)))
+                added += 1
+    return added
+
+def watch(base: Path, args):
+    state_path = Path(args.state) if args.state else base / ".assembler_state.json"
+    state = load_state(state_path)
+    pending, retry, high, floors, cnt = {}, {}, {}, {}, 0  # retry: chave -> {jpg: [item, tentativas, próxima]}
+    delay = timedelta(seconds=args.post + args.settle)
+    catalog = Catalog(base=base)
+    work = lambda uid_dir, camera, jpg: process_snapshot(uid_dir, camera, jpg, args.pre, args.post, catalog)
+    log(f"[watch] base={base} estado={state_path} fila_max={args.queue_max}")
+    next_backfill = time.monotonic() + BACKFILL_RECHECK
+    try:
+        while True:
+            # catálogo que falhou apaga o marcador da carga inicial: ressincroniza quando o banco voltar
+            if catalog.enabled and time.monotonic() >= next_backfill:
+                next_backfill = time.monotonic() + BACKFILL_RECHECK
+                ensure_backfill(base)
+            queued = sum(len(dq) for dq in pending.values())
+            if queued < args.queue_max: discover(base, state, pending, args.queue_max - queued, floors, retry)
+            now, did = datetime.now(timezone.utc), [0]
+            def due(key):
+                return [r for r in retry.get(key, {}).values() if r[2] <= now]
+            def ready(key, dq):
+                for r in due(key):
+                    # adiada já na saída: se o lease cair antes de rodar, volta no próximo backoff
+                    r[2] = now + timedelta(seconds=RETRY_BASE * 2 ** r[1])
+                    yield r[0][:3]
+                while dq and dq[0][3] + delay <= now: yield dq.popleft()[:3]
+            def done(key, item, ok):
+                jpg, rq = item[2], retry.setdefault(key, {})
+                if ok is False:
+                    did[0] += 1
+                    r = rq.setdefault(jpg, [item + (parse_snapshot_time(jpg),), 0, now])
+                    r[1] += 1; r[2] = datetime.now(timezone.utc) + timedelta(seconds=RETRY_BASE * 2 ** (r[1] - 1))
+                    if (r[2] - r[0][3]).total_seconds() <= RETRY_MAX_AGE: return
+                    log(f"[watch] desistindo de {key} {jpg.name} após {r[1]} tentativas")
+                rq.pop(jpg, None)
+                high[key] = max(high.get(key, ""), jpg.name)
+                if not rq and high[key] > state.get(key, ""):
+                    state[key] = high[key]; save_state(state_path, state)
+                if ok: did[0] += 1
+            t0 = time.monotonic()
+            sources = []
+            for key, dq in pending.items():
+                if due(key): uid_dir, camera = due(key)[0][0][:2]
+                elif dq and dq[0][3] + delay <= now: uid_dir, camera = dq[0][:2]
+                else: continue
+                sources.append((key, leased(uid_dir / "events" / camera, "assembler", ready(key, dq), log)))
+            n = schedule(sources, work, args.jobs, args.limit - cnt if args.limit else 0, done)
+            cnt += n
+            if n: log(f"[watch] {n} clipes em {time.monotonic() - t0:.1f}s ({rate(n, time.monotonic() - t0)} clipes/min)")
+            if args.limit and cnt >= args.limit: return
+            if not did[0]: time.sleep(args.poll)
+    finally:
+        catalog.close()
+        log(f"[fim] processados: {cnt}")
 
 def main():
     import argparse
     ap = argparse.ArgumentParser()
     ap.add_argument("--base"); ap.add_argument("--pre", type=int, default=DEFAULT_PRE); ap.add_argument("--post", type=int, default=DEFAULT_POST); ap.add_argument("--limit", type=int, default=0); ap.add_argument("--verbose", type=int, default=0)
+    ap.add_argument("--watch", action="store_true", help="roda continuamente, só com snapshots novos")
+    ap.add_argument("--poll", type=float, default=5.0); ap.add_argument("--settle", type=int, default=10, help="folga após --post para o Frigate fechar o segmento")
+    ap.add_argument("--queue-max", type=int, default=1000); ap.add_argument("--state")
+    ap.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="clipes em paralelo (câmeras distintas)")
+    ap.add_argument("--max-reencode", type=int, default=DEFAULT_MAX_REENCODE, help="re-encodes libx264 simultâneos")
     args = ap.parse_args()
-    global VERBOSE; VERBOSE = int(args.verbose)
+    global VERBOSE, REENCODE_SLOTS; VERBOSE = int(args.verbose)
+    REENCODE_SLOTS = threading.BoundedSemaphore(max(1, args.max_reencode))
     base = pick_base_dir(args.base)
     log(f"[info] base: {base}")
-    cnt = 0
-    for uid_dir, camera, jpg in find_snapshots(base):
-        out_mp4 = jpg.with_suffix('.mp4'); out_json = jpg.with_suffix('.json')
-        if out_mp4.exists(): continue
-        snap_ts = parse_snapshot_time(jpg)
-        t_start, t_end = snap_ts - timedelta(seconds=args.pre), snap_ts + timedelta(seconds=args.post)
-        dirs = recordings_dirs_for_range(uid_dir, camera, t_start, t_end)
-        if not dirs: continue
-        segs = select_segments(dirs, t_start, t_end)
-        if not segs: continue
-        ok, msg = build_concat_and_trim(segs, out_mp4, t_start, t_end)
-        if not ok: log(f"[ERRO] {uid_dir.name}/{camera} {jpg.name}: {msg}"); continue
-        meta = {"unique_id": uid_dir.name, "camera": camera, "snapshot": str(jpg), "video": str(out_mp4), "created_utc": datetime.now(timezone.utc).isoformat(), "snapshot_ts_utc": snap_ts.isoformat(), "start_utc": t_start.isoformat(), "end_utc": t_end.isoformat(), "pre_s": args.pre, "post_s": args.post}
-        with open(out_json, "w") as f: json.dump(meta, f, ensure_ascii=False, indent=2)
-        log(f"[ok] gerado: {out_mp4}")
-        cnt += 1
-        if args.limit and cnt >= args.limit: break
-    log(f"[fim] processados: {cnt}")
+    ensure_backfill(base)
+    if args.watch: return watch(base, args)
+    catalog = Catalog(base=base)
+    t0 = time.monotonic()
+    sources = [(f"{uid_dir.name}/{cam_dir.name}", leased(cam_dir, "assembler", camera_snapshots(uid_dir, cam_dir), log))
+               for uid_dir, cam_dir in camera_dirs(base)]
+    cnt = schedule(sources, lambda uid_dir, camera, jpg: process_snapshot(uid_dir, camera, jpg, args.pre, args.post, catalog), args.jobs, args.limit)
+    catalog.close()
+    dt = time.monotonic() - t0
+    log(f"[fim] processados: {cnt} em {dt:.1f}s ({rate(cnt, dt)} clipes/min, jobs={args.jobs}, reencode<={args.max_reencode})")
 
 if __name__ == "__main__": main()
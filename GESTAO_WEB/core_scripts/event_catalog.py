@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+import os, re, sys, json, time, argparse, threading
+from pathlib import Path
+from datetime import datetime, timezone
+
+# Catálogo de arquivos de evento (tabela event_catalog, modelo EventoCatalogo do GESTAO_WEB).
+# Usado pelos scripts do host: assembler/merge registram o que geram, o cleaner remove o que apaga.
+# O merge também grava event_video_link (snapshot -> *_merged.mp4 que o contém).
+# Falha de banco nunca derruba o script chamador: o catálogo fica desligado por CATALOG_RETRY_SEC e
+# o marcador da carga inicial da base é apagado, para a próxima execução ressincronizar o que passou.
+#   python3 event_catalog.py reconcile [--base DIR] [--uid UNIQUE_ID]   (carga inicial / ressincronia)
+# A carga inicial também roda sozinha na primeira execução do assembler/merge numa base
+# (ensure_backfill, marcador <base>/.catalog_backfill): o assembler só registra snapshots novos.
+
+CATALOG_DSN = os.environ.get("EVENT_CATALOG_DSN", "dbname='monitoramento' user='monitoramento' host='localhost' password='senha_super_segura' port='5432'")
+VERBOSE = int(os.environ.get("CATALOG_VERBOSE", "1"))
+BACKFILL_MARK = ".catalog_backfill"
+CATALOG_RETRY_SEC = float(os.environ.get("CATALOG_RETRY_SEC", "60"))
+
+SNAP_EXT = (".jpg", ".jpeg", ".png")
+DATE_RE = re.compile(r"(?P<date>\d{8})[_\-\.](?P<time>\d{6})")
+
+def log(*a):
+    if VERBOSE: print("[catalog]", *a, flush=True)
+
+def kind_of(name:str):
+    low = name.lower()
+    if low.endswith(SNAP_EXT): return "snapshot"
+    if low.endswith(".mp4"): return "merged" if "_merged" in low else "video"
+    if low.endswith(".json"): return "meta"
+    return None
+
+def parse_name(name:str):
+    """(ts, ts_end, objeto) a partir do nome: 20250101_120000_<...>_<objeto>.jpg ou <ini>__<fim>_merged.mp4"""
+    stem = os.path.splitext(name)[0]
+    found = [datetime.strptime(m.group("date") + m.group("time"), "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc) for m in DATE_RE.finditer(stem)]
+    ts = found[0] if found else None
+    ts_end = found[1] if "__" in stem and len(found) > 1 else None
+    objeto = None
+    if name.lower().endswith(SNAP_EXT):
+        parts = stem.split("_")
+        objeto = parts[-1] if len(parts) >= 3 else None
+    return ts, ts_end, objeto
+
+def split_event_path(p:Path):
+    """.../<unique_id>/events/<camera>/<arquivo> -> (unique_id, camera, arquivo)"""
+    parts = p.parts
+    if len(parts) < 4 or parts[-3] != "events": return None
+    return parts[-4], parts[-2], parts[-1]
+
+class Catalog:
+    def __init__(self, dsn:str=CATALOG_DSN, base:Path|None=None):
+        self.dsn, self._conn, self.enabled, self.base = dsn, None, True, base
+        self.errors, self._retry_at = 0, 0.0
+        self._lock = threading.Lock()  # uma conexão compartilhada pelas threads do assembler
+
+    def _failed(self, msg:str|None=None):
+        # algo deixou de ser registrado: a base precisa de reconcile na próxima carga inicial
+        self.errors += 1
+        if msg: log(f"[AVISO] {msg}")
+        if self.base is not None:
+            try: (self.base / BACKFILL_MARK).unlink(missing_ok=True)
+            except OSError: pass
+
+    def _cursor(self):
+        if not self.enabled and time.monotonic() < self._retry_at: return None
+        try:
+            if self._conn is None or self._conn.closed:
+                import psycopg2
+                self._conn = psycopg2.connect(self.dsn)
+            self.enabled = True
+            return self._conn.cursor()
+        except Exception as e:
+            self.enabled, self._retry_at = False, time.monotonic() + CATALOG_RETRY_SEC
+            self._failed(f"catálogo desativado por {CATALOG_RETRY_SEC:g}s: {e}")
+            return None
+
+    def _run(self, fn):
+        with self._lock:
+            cur = self._cursor()
+            if cur is None:
+                self._failed()
+                return 0
+            try:
+                with cur: n = fn(cur)
+                self._conn.commit()
+                return n
+            except Exception as e:
+                self._failed(f"falha no catálogo: {e}")
+                try: self._conn.rollback()
+                except Exception: pass
+                return 0
+
+    def upsert(self, paths):
+        rows = []
+        for p in paths:
+            p = Path(p); loc = split_event_path(p); kind = kind_of(p.name)
+            if loc is None or kind is None: continue
+            try: size = p.stat().st_size
+            except OSError: continue
+            ts, ts_end, objeto = parse_name(p.name)
+            rows.append((loc[0], loc[1], kind, loc[2], os.path.splitext(loc[2])[0], ts, ts_end, objeto, size))
+        if not rows: return 0
+        def fn(cur):
+            from psycopg2.extras import execute_values
+            execute_values(cur, """
+                INSERT INTO event_catalog (unique_id, camera, kind, filename, stem, ts, ts_end, objeto, size)
+                VALUES %s
+                ON CONFLICT (unique_id, camera, filename) DO UPDATE
+                  SET kind = EXCLUDED.kind, ts = EXCLUDED.ts, ts_end = EXCLUDED.ts_end,
+                      objeto = EXCLUDED.objeto, size = EXCLUDED.size, updated_at = now()
+            """, rows, page_size=500)
+            return len(rows)
+        return self._run(fn)
+
+    def remove(self, paths):
+        keys = [loc for loc in (split_event_path(Path(p)) for p in paths) if loc]
+        if not keys: return 0
+        arrays = ([k[0] for k in keys], [k[1] for k in keys], [k[2] for k in keys])
+        def fn(cur):
+            cur.execute("""
+                DELETE FROM event_catalog c
+                 USING unnest(%s::text[], %s::text[], %s::text[]) AS k(unique_id, camera, filename)
+                 WHERE c.unique_id = k.unique_id AND c.camera = k.camera AND c.filename = k.filename
+            """, arrays)
+            return cur.rowcount
+        def fn_links(cur):
+            # snapshot apagado ou merged apagado: o vínculo some junto
+            cur.execute("""
+                DELETE FROM event_video_link l
+                 USING unnest(%s::text[], %s::text[], %s::text[]) AS k(unique_id, camera, filename)
+                 WHERE l.unique_id = k.unique_id AND l.camera = k.camera AND (l.snapshot = k.filename OR l.video = k.filename)
+            """, arrays)
+            return cur.rowcount
+        n = self._run(fn)
+        self._run(fn_links)
+        return n
+
+    def link(self, snapshots, video):
+        """Registra que `video` (um *_merged.mp4) cobre cada snapshot .jpg de `snapshots`."""
+        loc = split_event_path(Path(video))
+        if loc is None: return 0
+        rows = [(loc[0], loc[1], Path(s).name, loc[2]) for s in snapshots]
+        if not rows: return 0
+        def fn(cur):
+            from psycopg2.extras import execute_values
+            execute_values(cur, """
+                INSERT INTO event_video_link (unique_id, camera, snapshot, video) VALUES %s
+                ON CONFLICT (unique_id, camera, snapshot, video) DO NOTHING
+            """, rows, page_size=500)
+            return len(rows)
+        return self._run(fn)
+
+    def close(self):
+        if self._conn is not None and not self._conn.closed: self._conn.close()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+def reconcile(base:Path, uid:str|None=None, batch:int=2000, cat:Catalog|None=None):
+    """Ressincroniza o catálogo com o disco: registra o que existe e remove linhas sem arquivo."""
+    cat = cat or Catalog()
+    added = removed = 0
+    uid_dirs = [base / uid] if uid else sorted(d for d in base.iterdir() if d.is_dir())
+    for uid_dir in uid_dirs:
+        ev = uid_dir / "events"
+        if not ev.is_dir(): continue
+        for cam_dir in sorted(d for d in ev.iterdir() if d.is_dir()):
+            on_disk, buf, merged_meta = set(), [], []
+            with os.scandir(cam_dir) as it:
+                for e in it:
+                    if e.name.startswith(".") or not e.is_file() or kind_of(e.name) is None: continue
+                    on_disk.add(e.name); buf.append(cam_dir / e.name)
+                    if e.name.endswith("_merged.json"): merged_meta.append(cam_dir / e.name)
+                    if len(buf) >= batch: added += cat.upsert(buf); buf = []
+            added += cat.upsert(buf)
+            for meta in merged_meta:
+                try: sources = json.loads(meta.read_text()).get("sources") or []
+                except (OSError, ValueError): continue
+                cat.link([Path(src).with_suffix(".jpg") for src in sources], meta.with_suffix(".mp4"))
+            cur = cat._cursor()
+            if cur is None: continue
+            with cur:
+                cur.execute("SELECT filename FROM event_catalog WHERE unique_id = %s AND camera = %s", (uid_dir.name, cam_dir.name))
+                gone = [cam_dir / f for (f,) in cur.fetchall() if f not in on_disk]
+            cat._conn.commit()
+            removed += cat.remove(gone)
+    cat.close()
+    log(f"reconcile: {added} registrados, {removed} removidos")
+    return added, removed
+
+def ensure_backfill(base:Path):
+    """Carga inicial do catálogo uma vez por base; o marcador só é gravado se o banco respondeu."""
+    mark = base / BACKFILL_MARK
+    if mark.exists(): return
+    log(f"carga inicial de {base} (primeira execução)")
+    cat = Catalog()
+    reconcile(base, cat=cat)
+    if not cat.errors: mark.write_text(datetime.now(timezone.utc).isoformat())
+
+def main():
+    ap = argparse.ArgumentParser(description="Catálogo de arquivos de evento.")
+    ap.add_argument("cmd", choices=["reconcile"])
+    ap.add_argument("--base", default=os.environ.get("FRIGATE_BASE", "/home/edimar/SISTEMA/FRIGATE"))
+    ap.add_argument("--uid")
+    args = ap.parse_args()
+    base = Path(args.base)
+    if not base.is_dir(): sys.exit(f"[ERRO] Diretório base não encontrado: {base}")
+    cat = Catalog()
+    reconcile(base, args.uid, cat=cat)
+    if not cat.errors and not args.uid: (base / BACKFILL_MARK).write_text(datetime.now(timezone.utc).isoformat())
+
+if __name__ == "__main__": main()
@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
-import os, sys, json, argparse
+import os, sys, json, time, argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
+from event_catalog import Catalog, parse_name
 
 FRIGATE_BASE_PATH = Path(os.environ.get("FRIGATE_BASE", "/home/edimar/SISTEMA/FRIGATE" ))
 DB_CACHE_FILE = FRIGATE_BASE_PATH / ".retention_db.json"
-VERBOSE = int(os.environ.get("CLEANER_VERBOSE", "1"))
+VERBOSE = int(os.environ.get("CLEANER_VERBOSE", "1"))  # 2 = uma linha por arquivo apagado
+BATCH = int(os.environ.get("CLEANER_BATCH", "500"))
 
 def log(*args):
     if VERBOSE: print(f"[{datetime.now().isoformat()}]", *args, flush=True)
@@ -38,30 +41,97 @@ def get_retention_data_from_db(target_camera_id=None):
             except json.JSONDecodeError: return {}
         return {}
 
+# ---- motor de retenção ----
+# Um os.scandir por câmera, sem montar lista: memória limitada a um lote de BATCH arquivos.
+# Nomes de evento começam com a data (YYYYMMDD_HHMMSS, merged: <ini>__<fim>): a decisão sai do
+# nome, sem stat; só arquivos sem data no nome caem no mtime (stat do DirEntry, em cache).
+# Os lotes são apagados por --workers threads com teto de --max-rate arquivos/s, para não
+# disputar o disco com o Frigate gravando; o catálogo recebe um DELETE por lote.
+
+def file_time(entry):
+    ts, ts_end, _ = parse_name(entry.name)
+    if ts_end or ts: return ts_end or ts
+    return datetime.fromtimestamp(entry.stat().st_mtime, tz=timezone.utc)
+
+class RateLimiter:
+    def __init__(self, per_sec: float):
+        self.interval, self.next = (1.0 / per_sec if per_sec > 0 else 0.0), time.monotonic()
+
+    def wait(self, n: int = 1):
+        if not self.interval: return
+        now = time.monotonic()
+        if self.next > now: time.sleep(self.next - now)
+        self.next = max(now, self.next) + n * self.interval
+
+class Cleaner:
+    def __init__(self, catalog, workers: int = 1, max_rate: float = 0, dry_run: bool = False):
+        self.catalog, self.dry_run = catalog, dry_run
+        self.pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        self.limiter = RateLimiter(max_rate)
+        self.stats = {"cameras": 0, "scanned": 0, "files_deleted": 0, "bytes_deleted": 0, "errors": 0}
+
+    def _unlink(self, item):
+        path, size = item
+        if self.dry_run: return path, size
+        try:
+            os.unlink(path)
+            if VERBOSE >= 2: log(f"  -> Apagado: {path}")
+            return path, size
+        except FileNotFoundError: return None
+        except OSError as e:
+            log(f"    [ERRO] Falha ao apagar {path}: {e}")
+            return False
+
+    def flush(self, batch):
+        if not batch: return
+        self.limiter.wait(len(batch))
+        results = list(self.pool.map(self._unlink, batch)) if self.pool else [self._unlink(it) for it in batch]
+        done = [r for r in results if r]
+        self.stats["errors"] += sum(1 for r in results if r is False)
+        self.stats["files_deleted"] += len(done)
+        self.stats["bytes_deleted"] += sum(size for _, size in done)
+        if not self.dry_run: self.catalog.remove([p for p, _ in done])
+        batch.clear()
+
+    def clean_dir(self, event_dir: Path, cutoff: datetime):
+        self.stats["cameras"] += 1
+        batch = []
+        with os.scandir(event_dir) as it:
+            for entry in it:
+                # estado/leases/temporários do assembler e do merge começam com "."
+                if entry.name.startswith("."): continue
+                self.stats["scanned"] += 1
+                try:
+                    if not entry.is_file(follow_symlinks=False) or file_time(entry) >= cutoff: continue
+                    batch.append((entry.path, entry.stat().st_size))
+                except OSError: self.stats["errors"] += 1; continue
+                if len(batch) >= BATCH: self.flush(batch)
+        self.flush(batch)
+
+    def close(self):
+        if self.pool: self.pool.shutdown()
+
 def main():
     parser = argparse.ArgumentParser(description="Limpa eventos de IA antigos.")
     parser.add_argument("--camera-id", type=int, help="ID da câmera específica para limpar.")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("CLEANER_WORKERS", "1")), help="threads de unlink")
+    parser.add_argument("--max-rate", type=float, default=float(os.environ.get("CLEANER_MAX_RATE", "0")), help="arquivos/s (0 = sem limite)")
+    parser.add_argument("--dry-run", action="store_true")
     args = parser.parse_args()
-    log(f"--- Iniciando limpeza de eventos (Alvo: {'Camera ID '+str(args.camera_id) if args.camera_id else 'Todas'}) ---")
     if not FRIGATE_BASE_PATH.is_dir(): sys.exit(f"[ERRO] Diretório base não encontrado: {FRIGATE_BASE_PATH}")
     retention_rules = get_retention_data_from_db(args.camera_id)
     if not retention_rules: sys.exit("[AVISO] Nenhuma regra de retenção encontrada.")
-    now, files_deleted, bytes_deleted = datetime.now(timezone.utc), 0, 0
-    for path_key, retention_days in retention_rules.items():
-        event_dir = FRIGATE_BASE_PATH / path_key
-        if not event_dir.is_dir(): continue
-        cutoff_date = now - timedelta(days=retention_days)
-        log(f"Processando '{event_dir.relative_to(FRIGATE_BASE_PATH)}' -> Reter {retention_days} dias (apagar antes de {cutoff_date.strftime('%Y-%m-%d')})")
-        for f in event_dir.iterdir():
-            try:
-                file_date = datetime.fromtimestamp(f.stat().st_mtime, tz=timezone.utc)
-                if file_date < cutoff_date:
-                    file_size = f.stat().st_size
-                    log(f"  -> Apagando: {f.name} (data: {file_date.strftime('%Y-%m-%d')})")
-                    f.unlink()
-                    files_deleted += 1
-                    bytes_deleted += file_size
-            except Exception as e: log(f"    [ERRO] Falha ao apagar {f.name}: {e}")
-    log(f"--- Limpeza concluída: {files_deleted} arquivos apagados ({bytes_deleted / (1024*1024):.2f} MB liberados) ---")
+    now, t0 = datetime.now(timezone.utc), time.monotonic()
+    with Catalog(base=FRIGATE_BASE_PATH) as catalog:
+        cleaner = Cleaner(catalog, args.workers, args.max_rate, args.dry_run)
+        try:
+            for path_key, retention_days in retention_rules.items():
+                event_dir = FRIGATE_BASE_PATH / path_key
+                if not event_dir.is_dir(): continue
+                cleaner.clean_dir(event_dir, now - timedelta(days=retention_days))
+        finally:
+            cleaner.close()
+    summary = dict(cleaner.stats, target=args.camera_id or "all", dry_run=args.dry_run, seconds=round(time.monotonic() - t0, 2))
+    print(json.dumps({"event_cleaner": summary}), flush=True)
 
 if __name__ == "__main__": main()
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
-import os, re, json, subprocess
+import os, re, json, heapq, subprocess
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
+from event_catalog import Catalog, ensure_backfill
+from work_area import CameraLease, job_dir, atomic_write_text
 
 BASE = Path(os.environ.get("FRIGATE_BASE", "/home/edimar/SISTEMA/FRIGATE"))
 MERGE_WINDOW = int(os.environ.get("MERGE_WINDOW_SEC", "30"))
@@ -9,6 +11,12 @@ MERGE_MIN = int(os.environ.get("MERGE_MIN_COUNT", "2"))
 MERGE_LIMIT = int(os.environ.get("MERGE_LIMIT", "5"))
 VERBOSE = int(os.environ.get("MERGE_VERBOSE", "1"))
 KEEP_ORIG = int(os.environ.get("MERGE_KEEP_ORIG", "1"))
+# folga para o assembler (atrasado) ainda entregar clipes antes de uma sequência ser fechada
+MERGE_SETTLE = int(os.environ.get("MERGE_SETTLE_SEC", "300"))
+# grupo que falha essa quantidade de execuções seguidas é deixado sem mesclar (clipes originais ficam)
+MERGE_MAX_ATTEMPTS = int(os.environ.get("MERGE_MAX_ATTEMPTS", "3"))
+
+CATALOG = Catalog(base=BASE)
 
 DATE_RE = re.compile(r"(?P<date>\d{8})[_\-\.](?P<time>\d{6})")
 
@@ -17,67 +25,187 @@ def parse_start_from_name(p: Path):
     if not m: return None
     return datetime.strptime(m.group("date")+m.group("time"), "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc)
 
-def ffprobe_duration(f: Path) -> float:
+def ffprobe_info(f: Path):
+    """(duração, assinatura dos streams) — a assinatura diz se dá para concatenar com -c copy."""
     try:
-        out = subprocess.check_output(["ffprobe","-v","error","-show_entries","format=duration","-of","default=nw=1:nk=1",str(f)], text=True).strip()
-        return float(out)
-    except Exception: return 0.0
+        out = subprocess.check_output(["ffprobe","-v","error","-show_entries","format=duration:stream=codec_type,codec_name,width,height","-of","json",str(f)], text=True)
+        info = json.loads(out)
+        streams = [f"{s.get('codec_type')}:{s.get('codec_name')}" + (f":{s['width']}x{s['height']}" if s.get("width") else "") for s in info.get("streams", [])]
+        return float(info.get("format", {}).get("duration") or 0), "|".join(streams) or None
+    except Exception: return 0.0, None
+
+# ---- cache de probe por câmera (.probe_cache.v2.json), chave nome -> (size, mtime) ----
+# ffprobe só roda para arquivo novo ou alterado; clipes do assembler nem isso: o .json ao
+# lado já traz start_utc/end_utc e a assinatura dos streams (sidecar antigo, sem ela: um
+# ffprobe só para a assinatura). Entradas de arquivos que sumiram saem no próximo save.
+PROBE_CACHE = ".probe_cache.v2.json"  # v2: entradas de sidecar com assinatura (v1 tinha streams=None)
+
+def load_probe_cache(cam_dir: Path) -> dict:
+    try: return json.loads((cam_dir / PROBE_CACHE).read_text())
+    except (OSError, ValueError): return {}
+
+def sidecar_span(p: Path):
+    """(início, fim, assinatura) do .json do assembler; assinatura None em sidecars antigos."""
+    try: meta = json.loads(p.with_suffix(".json").read_text())
+    except (OSError, ValueError): return None
+    try: return datetime.fromisoformat(meta["start_utc"]), datetime.fromisoformat(meta["end_utc"]), meta.get("streams")
+    except (KeyError, TypeError, ValueError): return None
 
-def build_groups(files):
-    groups, cur = [], []
+def probe(p: Path, st, cache: dict, fresh: dict) -> dict:
+    hit = cache.get(p.name)
+    if hit and hit.get("size") == st.st_size and hit.get("mtime") == st.st_mtime:
+        fresh[p.name] = hit
+        return hit
+    span = sidecar_span(p)
+    if span: dur, sig = (span[1] - span[0]).total_seconds(), span[2] or ffprobe_info(p)[1]
+    else: dur, sig = ffprobe_info(p)
+    fresh[p.name] = entry = {"size": st.st_size, "mtime": st.st_mtime, "duration": dur, "streams": sig}
+    return entry
+
+def build_chains(files):
+    chains, cur = [], []
     for item in files:
         if not cur: cur = [item]; continue
         prev = cur[-1]
         gap = (item["start"] - prev["end"]).total_seconds()
-        if gap <= MERGE_WINDOW: cur.append(item)
-        else:
-            if len(cur) >= MERGE_MIN: groups.append(cur)
-            cur = [item]
-    if cur and len(cur) >= MERGE_MIN: groups.append(cur)
-    return groups
+        # codecs/resolução diferentes não concatenam com -c copy: começa outro grupo
+        compatible = not (item.get("streams") and prev.get("streams")) or item["streams"] == prev["streams"]
+        if gap <= MERGE_WINDOW and compatible: cur.append(item)
+        else: chains.append(cur); cur = [item]
+    if cur: chains.append(cur)
+    return chains
 
 def concat_group(cam_dir: Path, group):
     first, last = group[0], group[-1]
     start_s, end_s = first["start"].strftime("%Y%m%d_%H%M%S"), last["end"].strftime("%Y%m%d_%H%M%S")
     out_mp4 = cam_dir / f"{start_s}__{end_s}_merged.mp4"
     if out_mp4.exists(): return False
-    tmp_dir = cam_dir / ".tmp_merge"; tmp_dir.mkdir(parents=True, exist_ok=True)
-    files_txt = tmp_dir / "files.txt"
-    with files_txt.open("w") as f:
-        for it in group: f.write(f"file '{it['path']}'\n")
-    concat_out = tmp_dir / "concat.mp4"
-    subprocess.check_call(["ffmpeg","-hide_banner","-nostdin","-y","-f","concat","-safe","0","-i",str(files_txt),"-c","copy",str(concat_out)])
-    concat_out.replace(out_mp4)
+    with job_dir(cam_dir, ".tmp_merge") as tmp_dir:
+        files_txt = tmp_dir / "files.txt"
+        with files_txt.open("w") as f:
+            for it in group: f.write(f"file '{it['path']}'\n")
+        concat_out = tmp_dir / "concat.mp4"
+        subprocess.check_call(["ffmpeg","-hide_banner","-nostdin","-y","-f","concat","-safe","0","-i",str(files_txt),"-c","copy",str(concat_out)])
+        concat_out.replace(out_mp4)
     meta = {"camera_dir": str(cam_dir), "output": str(out_mp4), "start_iso": first["start"].isoformat(), "end_iso": last["end"].isoformat(), "count": len(group), "sources": [str(it["path"]) for it in group]}
-    out_mp4.with_suffix(".json").write_text(json.dumps(meta, indent=2))
+    atomic_write_text(out_mp4.with_suffix(".json"), json.dumps(meta, indent=2))
+    CATALOG.upsert([out_mp4, out_mp4.with_suffix(".json")])
+    CATALOG.link([Path(it["path"]).with_suffix(".jpg") for it in group], out_mp4)
     if not KEEP_ORIG:
+        removed = []
         for it in group:
             try: Path(it["path"]).unlink(missing_ok=True); Path(it["path"]).with_suffix(".json").unlink(missing_ok=True)
             except Exception: pass
-    try: tmp_dir.rmdir()
-    except Exception: pass
+            removed += [Path(it["path"]), Path(it["path"]).with_suffix(".json")]
+        CATALOG.remove(removed)
     if VERBOSE: print(f"[ok] merged: {out_mp4} (n={len(group)})")
     return True
 
+# ---- planejamento incremental ----
+# Cada câmera guarda em .merge_state.json a marca `done_until`: fim do último clipe já resolvido
+# (mesclado ou isolado sem par). Só clipes que começam depois dela são listados/probados.
+# Uma sequência só é resolvida quando fechou (fim + janela + MERGE_SETTLE no passado); a que
+# ainda pode crescer espera a próxima execução. MERGE_LIMIT é repartido pelo grupo pendente
+# mais antigo entre todas as câmeras, então um cliente com muito histórico não trava os outros.
+# Um grupo que falha segura a marca (é refeito na próxima execução); `failed` conta as tentativas
+# e, passadas MERGE_MAX_ATTEMPTS, a marca pula o grupo.
+MERGE_STATE = ".merge_state.json"
+
+def load_merge_state(cam_dir: Path) -> dict:
+    try: return json.loads((cam_dir / MERGE_STATE).read_text())
+    except (OSError, ValueError): return {}
+
+def load_watermark(cam_dir: Path):
+    try: return datetime.fromisoformat(load_merge_state(cam_dir)["done_until"])
+    except (KeyError, TypeError, ValueError): return None
+
+def save_watermark(cam_dir: Path, ts: datetime):
+    atomic_write_text(cam_dir / MERGE_STATE, json.dumps({"done_until": ts.isoformat()}))
+
+def record_failure(cam_dir: Path, group) -> int:
+    state, start = load_merge_state(cam_dir), group[0]["start"].isoformat()
+    failed = state.get("failed") or {}
+    n = failed.get("attempts", 0) + 1 if failed.get("start") == start else 1
+    state["failed"] = {"start": start, "attempts": n}
+    atomic_write_text(cam_dir / MERGE_STATE, json.dumps(state))
+    return n
+
+def new_items(cam_dir: Path, watermark):
+    with os.scandir(cam_dir) as it:
+        names = sorted(e.name for e in it if e.name.endswith(".mp4") and "_merged" not in e.name)
+    cache, fresh, items = load_probe_cache(cam_dir), {}, []
+    for name in names:
+        p = cam_dir / name
+        st = parse_start_from_name(p)
+        if watermark and st and st <= watermark: continue
+        try: fst = p.stat()
+        except FileNotFoundError: continue
+        st = st or datetime.fromtimestamp(fst.st_mtime, tz=timezone.utc)
+        if watermark and st <= watermark: continue
+        info = probe(p, fst, cache, fresh)
+        dur = info["duration"]
+        end = st if dur <= 0 else (st + timedelta(seconds=dur))
+        items.append({"path": str(p), "start": st, "end": end, "streams": info.get("streams")})
+    if fresh != cache: atomic_write_text(cam_dir / PROBE_CACHE, json.dumps(fresh))
+    items.sort(key=lambda x: x["start"])
+    return items
+
+def plan_camera(cam_dir: Path, now: datetime):
+    """[(grupo ou None, done_until depois dele)] das sequências já fechadas, em ordem."""
+    cutoff = now - timedelta(seconds=MERGE_WINDOW + MERGE_SETTLE)
+    steps = []
+    for chain in build_chains(new_items(cam_dir, load_watermark(cam_dir))):
+        if chain[-1]["end"] > cutoff: break
+        steps.append((chain if len(chain) >= MERGE_MIN else None, chain[-1]["end"]))
+    return steps
+
+def skip_settled(cam_dir: Path, steps) -> int:
+    # sequências sem grupo (clipe isolado) só avançam a marca
+    i = 0
+    while i < len(steps) and steps[i][0] is None: i += 1
+    if i: save_watermark(cam_dir, steps[i-1][1])
+    return i
+
 def main():
     if not BASE.exists(): return
+    ensure_backfill(BASE)
+    now, leases, plans, heap = datetime.now(timezone.utc), {}, {}, []
     processed_groups = 0
-    for uid_dir in sorted([d for d in BASE.iterdir() if d.is_dir()]):
-        events_dir = uid_dir / "events"
-        if not events_dir.exists(): continue
-        for cam_dir in sorted([d for d in events_dir.iterdir() if d.is_dir()]):
-            mp4s = sorted([p for p in cam_dir.glob("*.mp4") if "_merged" not in p.name])
-            if not mp4s: continue
-            items = []
-            for p in mp4s:
-                st = parse_start_from_name(p) or datetime.fromtimestamp(p.stat().st_mtime, tz=timezone.utc)
-                dur = ffprobe_duration(p)
-                end = st if dur <= 0 else (st + timedelta(seconds=dur))
-                items.append({"path": str(p), "start": st, "end": end})
-            items.sort(key=lambda x: x["start"])
-            groups = build_groups(items)
-            for g in groups:
-                if processed_groups >= MERGE_LIMIT: return
-                if concat_group(cam_dir, g): processed_groups += 1
-
-if __name__ == "__main__": main()
+    try:
+        for uid_dir in sorted([d for d in BASE.iterdir() if d.is_dir()]):
+            events_dir = uid_dir / "events"
+            if not events_dir.exists(): continue
+            for cam_dir in sorted([d for d in events_dir.iterdir() if d.is_dir()]):
+                # outra instância (cron sobreposto, outro host) já cuida desta câmera
+                lease = CameraLease(cam_dir, "merge")
+                if not lease.acquire():
+                    if VERBOSE: print(f"[lease] {cam_dir} ocupado; pulando")
+                    continue
+                leases[cam_dir] = lease
+                steps = plan_camera(cam_dir, now)
+                steps = steps[skip_settled(cam_dir, steps):]
+                if steps:
+                    plans[cam_dir] = steps
+                    heapq.heappush(heap, (steps[0][0][0]["start"], str(cam_dir)))
+        while heap and processed_groups < MERGE_LIMIT:
+            _, key = heapq.heappop(heap)
+            cam_dir = Path(key); steps = plans[cam_dir]
+            if not leases[cam_dir].renew(): continue
+            group, done_until = steps.pop(0)
+            try:
+                if concat_group(cam_dir, group): processed_groups += 1
+            except Exception as e:
+                n = record_failure(cam_dir, group)
+                print(f"[ERRO] merge {cam_dir} (tentativa {n}/{MERGE_MAX_ATTEMPTS}): {e}", flush=True)
+                if n < MERGE_MAX_ATTEMPTS: continue  # marca fica onde estava: o grupo é refeito na próxima execução
+                print(f"[merge] desistindo do grupo {group[0]['start'].isoformat()} de {cam_dir}", flush=True)
+            save_watermark(cam_dir, done_until)
+            del steps[:skip_settled(cam_dir, steps)]
+            if steps: heapq.heappush(heap, (steps[0][0][0]["start"], key))
+        if VERBOSE: print(f"[fim] grupos mesclados: {processed_groups}, pendentes: {sum(g is not None for s in plans.values() for g, _ in s)}")
+    finally:
+        for lease in leases.values(): lease.release()
+
+if __name__ == "__main__":
+    try: main()
+    finally: CATALOG.close()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+import os, json, time, uuid, shutil, socket, tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+# Área de trabalho isolada + lease por diretório de câmera, para o assembler e o merge
+# rodarem em várias instâncias (cron sobreposto, vários hosts no mesmo storage).
+# - job_dir: diretório temporário único dentro do diretório da câmera (mesmo filesystem,
+#   então o resultado entra no lugar com rename atômico).
+# - CameraLease: arquivo .<papel>.lease.<geração> com dono e validade; quem não tem o lease pula
+#   a câmera. Não depende de flock (não confiável em NFS): vale o arquivo e o relógio dos hosts (NTP).
+
+LEASE_TTL = int(os.environ.get("EVENT_LEASE_TTL", "300"))
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def atomic_write_text(path: Path, text: str):
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+@contextmanager
+def job_dir(parent: Path, prefix: str):
+    d = Path(tempfile.mkdtemp(prefix=f"{prefix}.", dir=parent))
+    try: yield d
+    finally: shutil.rmtree(d, ignore_errors=True)
+
+class CameraLease:
+    # .<papel>.lease.<geração>: vale o arquivo de maior geração. Assumir um lease vencido = criar a
+    # geração seguinte com os.link (atômico, falha se o destino existe): entre dois que tentam juntos
+    # só um cria; o outro recebe FileExistsError. O arquivo já nasce com conteúdo (link de um
+    # temporário), então ninguém lê um lease vazio. O release só marca vencido: o arquivo fica e a
+    # geração nunca volta atrás; quem assume apaga as gerações anteriores.
+    def __init__(self, cam_dir: Path, role: str, ttl: int = LEASE_TTL):
+        self.dir, self.prefix, self.ttl, self.held, self.gen = cam_dir, f".{role}.lease.", ttl, False, 0
+
+    def _path(self, gen: int) -> Path:
+        return self.dir / f"{self.prefix}{gen}"
+
+    def _gens(self) -> list:
+        with os.scandir(self.dir) as it:
+            return sorted(int(e.name[len(self.prefix):]) for e in it
+                          if e.name.startswith(self.prefix) and e.name[len(self.prefix):].isdigit())
+
+    def _read(self, gen: int):
+        try: return json.loads(self._path(gen).read_text())
+        except (OSError, ValueError): return None
+
+    def _body(self, until: float) -> str:
+        return json.dumps({"owner": OWNER, "until": until})
+
+    def acquire(self) -> bool:
+        gens = self._gens()
+        top = gens[-1] if gens else 0
+        cur = self._read(top) if top else None
+        if cur and cur.get("until", 0) > time.time():
+            if cur.get("owner") != OWNER: return False
+            self.held, self.gen = True, top
+            return True
+        # vencido, liberado, ilegível ou inexistente: tenta criar a geração seguinte
+        tmp = self.dir / f"{self.prefix}tmp.{uuid.uuid4().hex[:8]}"
+        tmp.write_text(self._body(time.time() + self.ttl))
+        try: os.link(tmp, self._path(top + 1))
+        except FileExistsError: return False
+        finally: tmp.unlink(missing_ok=True)
+        self.held, self.gen = True, top + 1
+        for g in gens: self._path(g).unlink(missing_ok=True)
+        return True
+
+    def renew(self) -> bool:
+        if not self.held: return False
+        cur = self._read(self.gen)
+        if self._gens()[-1:] != [self.gen] or not cur or cur.get("owner") != OWNER:
+            self.held = False  # venceu e outro assumiu
+            return False
+        atomic_write_text(self._path(self.gen), self._body(time.time() + self.ttl))
+        return True
+
+    def release(self):
+        if not self.held: return
+        self.held = False
+        cur = self._read(self.gen)
+        if self._gens()[-1:] == [self.gen] and cur and cur.get("owner") == OWNER:
+            atomic_write_text(self._path(self.gen), self._body(0))
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.release()
+
+def leased(cam_dir: Path, role: str, items, log=print):
+    """Itera `items` só enquanto o lease da câmera estiver com esta instância; renova a cada item."""
+    lease = CameraLease(cam_dir, role)
+    if not lease.acquire():
+        log(f"[lease] {cam_dir} ocupado por outra instância; pulando")
+        return
+    try:
+        for item in items:
+            if not lease.renew():
+                log(f"[lease] {cam_dir} perdido; parando")
+                return
+            yield item
+    finally:
+        lease.release()
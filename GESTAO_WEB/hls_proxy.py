@@ -0,0 +1,119 @@
+import asyncio, re, time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import httpx
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+# Proxy HLS para o MediaMTX com um único cliente httpx (pool e timeouts ajustados).
+#  - playlists (.m3u8): cache de poucos segundos; segmentos (.ts/.m4s/.mp4): LRU em memória por bytes.
+#  - pedidos simultâneos do mesmo arquivo (vários operadores na mesma câmera) dividem um fetch.
+#  - Range é atendido direto do cache; o resto é repassado em streaming e a resposta do
+#    MediaMTX é fechada quando o cliente termina ou desconecta.
+# Só alguns cabeçalhos do upstream passam adiante (nada de Connection/Transfer-Encoding do MediaMTX).
+
+PLAYLIST_EXT = (".m3u8",)
+SEGMENT_EXT = (".ts", ".m4s", ".mp4", ".aac")
+PASS_HEADERS = ("content-type", "etag", "last-modified")
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+class _Entry:
+    __slots__ = ("body", "content_type", "expires")
+    def __init__(self, body: bytes, content_type: str, expires: float):
+        self.body, self.content_type, self.expires = body, content_type, expires
+
+class HlsProxy:
+    def __init__(self, base_url: str, cache_bytes: int = 64 << 20, playlist_ttl: float = 1.0, segment_ttl: float = 120.0,
+                 max_segment_bytes: int = 16 << 20, max_connections: int = 100, connect_timeout: float = 3.0, read_timeout: float = 15.0):
+        self.base_url = base_url.rstrip("/")
+        self.cache_bytes, self.playlist_ttl, self.segment_ttl, self.max_segment_bytes = cache_bytes, playlist_ttl, segment_ttl, max_segment_bytes
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max(1, max_connections // 2), keepalive_expiry=30),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout, pool=connect_timeout))
+        self.cache: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.size = 0
+        self.pending: Dict[str, asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    async def close(self):
+        await self.client.aclose()
+
+    # ---- cache LRU ----
+    def _get(self, key: str) -> Optional[_Entry]:
+        e = self.cache.get(key)
+        if e is None: return None
+        if e.expires < time.monotonic():
+            self._drop(key); return None
+        self.cache.move_to_end(key)
+        return e
+
+    def _drop(self, key: str):
+        e = self.cache.pop(key, None)
+        if e: self.size -= len(e.body)
+
+    def _put(self, key: str, e: _Entry):
+        if len(e.body) > self.max_segment_bytes: return
+        self._drop(key)
+        self.cache[key] = e; self.size += len(e.body)
+        while self.size > self.cache_bytes and self.cache: self._drop(next(iter(self.cache)))
+
+    # ---- busca compartilhada ----
+    async def _fetch(self, path: str, ttl: float) -> Tuple[int, Optional[_Entry]]:
+        r = await self.client.get(f"{self.base_url}/{path}")
+        if r.status_code != 200: return r.status_code, None
+        e = _Entry(r.content, r.headers.get("content-type", "application/octet-stream"), time.monotonic() + ttl)
+        self._put(path, e)
+        return 200, e
+
+    async def _cached(self, path: str, ttl: float) -> Tuple[int, Optional[_Entry]]:
+        e = self._get(path)
+        if e: self.stats["hits"] += 1; return 200, e
+        fut = self.pending.get(path)
+        if fut is None:
+            self.stats["misses"] += 1
+            fut = self.pending[path] = asyncio.ensure_future(self._fetch(path, ttl))
+            fut.add_done_callback(lambda _: self.pending.pop(path, None))
+        else: self.stats["coalesced"] += 1
+        # shield: um viewer que desconecta não cancela o fetch dos outros
+        return await asyncio.shield(fut)
+
+    # ---- respostas ----
+    @staticmethod
+    def _from_entry(e: _Entry, range_header: Optional[str], cache_control: str) -> Response:
+        body, total = e.body, len(e.body)
+        headers = {"Accept-Ranges": "bytes", "Cache-Control": cache_control}
+        m = RANGE_RE.match(range_header.strip()) if range_header else None
+        if m and (m.group(1) or m.group(2)):
+            if m.group(1): start, end = int(m.group(1)), int(m.group(2)) if m.group(2) else total - 1
+            else: start, end = max(0, total - int(m.group(2))), total - 1
+            if start >= total or start > end:
+                return Response(status_code=416, headers={"Content-Range": f"bytes */{total}"})
+            end = min(end, total - 1)
+            headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+            return Response(body[start:end + 1], status_code=206, media_type=e.content_type, headers=headers)
+        return Response(body, media_type=e.content_type, headers=headers)
+
+    async def _passthrough(self, path: str, range_header: Optional[str]) -> Response:
+        req = self.client.build_request("GET", f"{self.base_url}/{path}", headers={"Range": range_header} if range_header else None)
+        r = await self.client.send(req, stream=True)
+        if r.status_code >= 400:
+            await r.aclose()
+            return Response(status_code=r.status_code)
+        # bytes crus do upstream: content-length/content-encoding valem como vieram
+        headers = {k: v for k, v in r.headers.items() if k.lower() in PASS_HEADERS + ("content-length", "content-range", "accept-ranges", "content-encoding")}
+        return StreamingResponse(r.aiter_raw(), status_code=r.status_code, headers=headers, background=BackgroundTask(r.aclose))
+
+    async def get(self, path: str, range_header: Optional[str] = None) -> Response:
+        try:
+            low = path.lower()
+            if low.endswith(PLAYLIST_EXT):
+                code, e = await self._cached(path, self.playlist_ttl)
+                if not e: return Response(status_code=code)
+                return self._from_entry(e, None, "no-cache")
+            if low.endswith(SEGMENT_EXT):
+                code, e = await self._cached(path, self.segment_ttl)
+                return self._from_entry(e, range_header, "public, max-age=60") if e else Response(status_code=code)
+            return await self._passthrough(path, range_header)
+        except httpx.RequestError as e:
+            raise HTTPException(status_code=502, detail=f"Não foi possível conectar ao MediaMTX: {e}")
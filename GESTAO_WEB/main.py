@@ -1,16 +1,19 @@
-import os, random, string, re, unidecode, subprocess, asyncio, json, httpx
+import os, random, string, re, time, unidecode, subprocess, asyncio, json, base64
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, date, timedelta
+from urllib.parse import urlencode
 from fastapi import FastAPI, Depends, HTTPException, Form, status, WebSocket, Request, BackgroundTasks
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import sessionmaker, Session, joinedload
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, func, tuple_
 from jinja2 import Environment, FileSystemLoader
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from config.settings import settings
-from models import Base, Cliente, Camera
+from models import Base, Cliente, Camera, EventoCatalogo, EventoVideoLink
+from orchestrator import Orchestrator, run_script
+from hls_proxy import HlsProxy
 
 MANAGE_FRIGATE_SCRIPT = "/code/gerenciar_frigate.py"
 MANAGE_YOLO_SCRIPT = "/code/gerenciar_yolo.py"
@@ -22,7 +25,9 @@ app = FastAPI(title=settings.app_title, version=settings.app_version)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 app.mount("/media_files", StaticFiles(directory="media_files"), name="media_files")
 templates = Environment(loader=FileSystemLoader("templates"))
-http_client = httpx.AsyncClient(  )
+hls_proxy = HlsProxy(settings.mediamtx_hls_url, cache_bytes=settings.hls_cache_mb << 20, playlist_ttl=settings.hls_playlist_ttl,
+                     max_connections=settings.hls_max_connections, connect_timeout=settings.hls_connect_timeout, read_timeout=settings.hls_read_timeout)
+orquestrador = Orchestrator(workers=settings.orq_workers, job_ttl=settings.orq_job_ttl, status_ttl=settings.orq_status_ttl)
 
 def sensitivity_filter(value): return {50: 'Baixa', 25: 'Média', 10: 'Alta'}.get(value, 'Desconhecida')
 templates.filters['sensitivity'] = sensitivity_filter
@@ -35,27 +40,80 @@ def get_db():
 @app.on_event("startup")
 def on_startup(): Base.metadata.create_all(bind=engine)
 
+@app.on_event("startup")
+async def start_orquestrador(): orquestrador.start()
+
+@app.on_event("shutdown")
+async def stop_orquestrador(): await orquestrador.stop()
+
+@app.on_event("shutdown")
+async def stop_hls_proxy(): await hls_proxy.close()
+
 def trigger_event_cleanup(camera_id: int):
     try:
         command = ["sudo", "-u", "edimar", "python3", EVENT_CLEANER_SCRIPT, "--camera-id", str(camera_id)]
-        subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)  # ninguém lê: PIPE cheio travava o cleaner
         print(f"INFO: Limpeza de eventos iniciada para a câmera ID {camera_id}.")
     except Exception as e:
         print(f"ERRO: Falha ao iniciar a limpeza de eventos para a câmera ID {camera_id}: {e}")
 
-def get_status_details(cliente_id: int) -> dict:
+def _cliente_para_status(cliente_id: int):
     db = SessionLocal()
-    cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
-    db.close()
-    if not cliente: return {"status": "nao_encontrado", "frigate_port": None}
-    if cliente.frigate_container_status == 'pendente': return {"status": "pendente", "frigate_port": cliente.frigate_port}
-    if not cliente.frigate_port: return {"status": "nao_criado", "frigate_port": None}
     try:
-        result = subprocess.run(["python3", MANAGE_FRIGATE_SCRIPT, "status", str(cliente_id)], capture_output=True, text=True, check=True, timeout=10)
-        status_data = json.loads(result.stdout.strip())
-        status_data['frigate_port'] = cliente.frigate_port
+        cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
+        return None if not cliente else (cliente.frigate_container_status, cliente.frigate_port)
+    finally: db.close()
+
+async def get_status_details(cliente_id: int) -> dict:
+    row = await asyncio.to_thread(_cliente_para_status, cliente_id)
+    if not row: return {"status": "nao_encontrado", "frigate_port": None}
+    container_status, frigate_port = row
+    if container_status == 'pendente': return {"status": "pendente", "frigate_port": frigate_port}
+    if not frigate_port: return {"status": "nao_criado", "frigate_port": None}
+    try:
+        rc, out, _ = await run_script(MANAGE_FRIGATE_SCRIPT, "status", str(cliente_id), timeout=10)
+        if rc != 0: raise RuntimeError(f"rc={rc}")
+        status_data = json.loads(out.strip())
+        status_data['frigate_port'] = frigate_port
         return status_data
-    except Exception: return {"status": "nao_criado", "frigate_port": cliente.frigate_port}
+    except Exception: return {"status": "nao_criado", "frigate_port": frigate_port}
+
+async def _script_job(job, *args: str, timeout: float, aviso: str):
+    rc, out, err = await run_script(*args, timeout=timeout)
+    job.info(f"{' '.join(args[1:])}: rc={rc}")
+    # como antes: falha do script é aviso, a remoção no banco segue
+    if rc != 0: print(f"AVISO: {aviso} falhou: {(err or out).strip()[-500:]}"); job.info(f"AVISO: {aviso} falhou")
+
+def _remover_cliente_db(cliente_id: int):
+    db = SessionLocal()
+    try:
+        cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
+        if cliente: db.delete(cliente); db.commit()
+    finally: db.close()
+
+async def job_excluir_cliente(job, cliente_id: int):
+    await _script_job(job, MANAGE_FRIGATE_SCRIPT, "remover", str(cliente_id), timeout=90, aviso="Script de remoção do Frigate")
+    await _script_job(job, MANAGE_YOLO_SCRIPT, "remover-cliente", str(cliente_id), timeout=180, aviso="Script de remoção do YOLO")
+    await asyncio.to_thread(_remover_cliente_db, cliente_id)
+
+def _remover_camera_db(camera_id: int):
+    """Apaga a câmera; True se o cliente ficou sem câmeras (o Frigate dele sai junto)."""
+    db = SessionLocal()
+    try:
+        camera = db.query(Camera).filter(Camera.id == camera_id).first()
+        if not camera: return False
+        cliente_id = camera.cliente_id
+        db.delete(camera); db.commit()
+        if db.query(Camera).filter(Camera.cliente_id == cliente_id).count() == 0: return True
+        cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
+        if cliente: cliente.frigate_container_status = 'pendente'; db.commit()
+        return False
+    finally: db.close()
+
+async def job_excluir_camera(job, camera_id: int, cliente_id: int):
+    await _script_job(job, MANAGE_YOLO_SCRIPT, "remover-camera", str(camera_id), timeout=60, aviso="Script de remoção do YOLO")
+    if await asyncio.to_thread(_remover_camera_db, camera_id):
+        await _script_job(job, MANAGE_FRIGATE_SCRIPT, "remover", str(cliente_id), timeout=90, aviso="Script de remoção do Frigate")
 
 @app.get("/", response_class=HTMLResponse)
 def home(request: Request, db: Session = Depends(get_db)):
@@ -92,19 +150,33 @@ def ver_cliente(cliente_id: int, request: Request, db: Session = Depends(get_db)
     return templates.get_template("ver_cliente.html").render(request=request, cliente=cliente, suggested_cam_name=suggested_name)
 
 @app.get("/cliente/{cliente_id}/status", response_class=JSONResponse)
-def get_cliente_status(cliente_id: int):
-    return get_status_details(cliente_id)
+async def get_cliente_status(cliente_id: int):
+    return await orquestrador.status(cliente_id, get_status_details)
+
+@app.get("/api/jobs/{job_id}", response_class=JSONResponse)
+def ver_job(job_id: int):
+    job = orquestrador.get(job_id)
+    if not job: raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job.as_dict()
+
+@app.get("/api/cliente/{cliente_id}/jobs", response_class=JSONResponse)
+def ver_jobs_cliente(cliente_id: int):
+    return {"jobs": [j.as_dict() for j in orquestrador.jobs_do_cliente(cliente_id)]}
+
+def _desativar_cliente(cliente_id: int) -> bool:
+    db = SessionLocal()
+    try:
+        cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
+        if not cliente: return False
+        cliente.ativo = False; db.commit()  # some da lista já; o registro sai quando o job terminar
+        return True
+    finally: db.close()
 
 @app.post("/cliente/{cliente_id}/excluir", response_class=RedirectResponse)
-def excluir_cliente(cliente_id: int, db: Session = Depends(get_db)):
-    cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
-    if not cliente: raise HTTPException(404, "Cliente não encontrado")
-    try: subprocess.run(["python3", MANAGE_FRIGATE_SCRIPT, "remover", str(cliente.id)], check=True, timeout=90)
-    except Exception as e: print(f"AVISO: Script de remoção do Frigate falhou: {e}")
-    try: subprocess.run(["python3", MANAGE_YOLO_SCRIPT, "remover-cliente", str(cliente.id)], check=True, timeout=180)
-    except Exception as e: print(f"AVISO: Script de remoção do YOLO falhou: {e}")
-    db.delete(cliente); db.commit()
-    return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
+async def excluir_cliente(cliente_id: int):
+    if not await asyncio.to_thread(_desativar_cliente, cliente_id): raise HTTPException(404, "Cliente não encontrado")
+    job = orquestrador.submit("excluir_cliente", cliente_id, cliente_id, lambda j: job_excluir_cliente(j, cliente_id))
+    return RedirectResponse(url=f"/?job={job.id}", status_code=status.HTTP_303_SEE_OTHER)
 
 @app.post("/cliente/{cliente_id}/add_camera", response_class=RedirectResponse)
 def add_camera(cliente_id: int, db: Session = Depends(get_db), nome: str = Form(...), resolucao: str = Form(...), dias_armazenamento: int = Form(...), observacao: str = Form(""), record_enabled: Optional[bool] = Form(None), detect_enabled: Optional[bool] = Form(None), detection_type: str = Form(...), objects_to_track: List[str] = Form(default=[]), motion_sensitivity: str = Form("medio"), ia_fps: int = Form(15), ia_event_retention_days: int = Form(7)):
@@ -123,51 +195,64 @@ def add_camera(cliente_id: int, db: Session = Depends(get_db), nome: str = Form(
     cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
     if cliente: cliente.frigate_container_status = 'pendente'
     db.commit()
+    orquestrador.invalidate_status(cliente_id)
     return RedirectResponse(url=f"/cliente/{cliente_id}", status_code=status.HTTP_303_SEE_OTHER)
 
-@app.post("/camera/{camera_id}/excluir", response_class=RedirectResponse)
-def excluir_camera(camera_id: int, db: Session = Depends(get_db)):
-    camera = db.query(Camera).filter(Camera.id == camera_id).first()
-    if not camera: raise HTTPException(404, "Câmera não encontrada")
-    cliente_id = camera.cliente_id
-    try: subprocess.run(["python3", MANAGE_YOLO_SCRIPT, "remover-camera", str(camera.id)], check=True, timeout=60)
-    except Exception as e: print(f"AVISO: Script de remoção do YOLO falhou: {e}")
-    db.delete(camera); db.commit()
-
-    if db.query(Camera).filter(Camera.cliente_id == cliente_id).count() == 0:
-        try: subprocess.run(["python3", MANAGE_FRIGATE_SCRIPT, "remover", str(cliente_id)], check=True, timeout=90)
-        except Exception as e: print(f"AVISO: Script de remoção do Frigate falhou: {e}")
-    else:
-        cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
-        if cliente: cliente.frigate_container_status = 'pendente'; db.commit()
+def _cliente_da_camera(camera_id: int):
+    db = SessionLocal()
+    try:
+        camera = db.query(Camera).filter(Camera.id == camera_id).first()
+        return camera.cliente_id if camera else None
+    finally: db.close()
 
-    return RedirectResponse(url=f"/cliente/{cliente_id}", status_code=status.HTTP_303_SEE_OTHER)
+@app.post("/camera/{camera_id}/excluir", response_class=RedirectResponse)
+async def excluir_camera(camera_id: int):
+    cliente_id = await asyncio.to_thread(_cliente_da_camera, camera_id)
+    if cliente_id is None: raise HTTPException(404, "Câmera não encontrada")
+    job = orquestrador.submit("excluir_camera", camera_id, cliente_id, lambda j: job_excluir_camera(j, camera_id, cliente_id))
+    return RedirectResponse(url=f"/cliente/{cliente_id}?job={job.id}", status_code=status.HTTP_303_SEE_OTHER)
+
+async def stream_process(send, prefix: str, *args: str) -> int:
+    """Roda python3 <args> repassando stdout e stderr à medida que chegam (nenhum pipe enche parado)."""
+    proc = await asyncio.create_subprocess_exec("python3", *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    async def pump(stream, tag):
+        async for line in stream: await send(f"{prefix}{tag}{line.decode(errors='replace')}")
+    await asyncio.gather(pump(proc.stdout, ""), pump(proc.stderr, "ERRO: "))
+    return await proc.wait()
 
 @app.websocket("/ws/frigate_manage/{cliente_id}")
 async def websocket_manage_frigate(websocket: WebSocket, cliente_id: int):
     await websocket.accept()
     db = SessionLocal()
+    send_lock = asyncio.Lock()
+    async def send(text: str):
+        async with send_lock: await websocket.send_text(text)  # várias câmeras escrevendo no mesmo socket
     try:
-        await websocket.send_text(">>> Sincronizando Gravação (Frigate)...\n")
-        p_frigate = await asyncio.create_subprocess_exec("python3", MANAGE_FRIGATE_SCRIPT, "criar", str(cliente_id), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
-        async for line in p_frigate.stdout: await websocket.send_text(line.decode())
-        async for line in p_frigate.stderr: await websocket.send_text(f"ERRO: {line.decode()}")
-        await p_frigate.wait()
+        await send(">>> Sincronizando Gravação (Frigate)...\n")
+        await stream_process(send, "", MANAGE_FRIGATE_SCRIPT, "criar", str(cliente_id))
 
-        await websocket.send_text("\n>>> Sincronizando Detectores de IA (YOLO)...\n")
+        await send("\n>>> Sincronizando Detectores de IA (YOLO)...\n")
         cliente = db.query(Cliente).options(joinedload(Cliente.cameras)).filter(Cliente.id == cliente_id).first()
         if cliente and cliente.cameras:
-            for cam in cliente.cameras:
-                await websocket.send_text(f"--> Processando câmera: {cam.nome}\n")
-                p_yolo = await asyncio.create_subprocess_exec("python3", MANAGE_YOLO_SCRIPT, "criar-atualizar", str(cam.id), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
-                async for line in p_yolo.stdout: await websocket.send_text(f"    {line.decode()}")
-                async for line in p_yolo.stderr: await websocket.send_text(f"    ERRO: {line.decode()}")
-                await p_yolo.wait()
-        await websocket.send_text("\n>>> Sincronização Concluída.")
-    except Exception as e: await websocket.send_text(f"\n>>> Erro geral: {str(e)}")
+            slots, resumo = asyncio.Semaphore(max(1, settings.yolo_sync_concurrency)), {}
+            async def sync_camera(cam):
+                async with slots:
+                    await send(f"--> Processando câmera: {cam.nome}\n")
+                    t0 = time.monotonic()
+                    try: rc = await stream_process(send, f"    [{cam.nome}] ", MANAGE_YOLO_SCRIPT, "criar-atualizar", str(cam.id))
+                    except Exception as e: await send(f"    [{cam.nome}] ERRO: {e}\n"); rc = -1
+                    resumo[cam.nome] = (rc, time.monotonic() - t0)
+            t0 = time.monotonic()
+            await asyncio.gather(*(sync_camera(cam) for cam in cliente.cameras))
+            await send(f"\n>>> Resumo YOLO ({len(resumo)} câmeras em {time.monotonic() - t0:.1f}s, até {settings.yolo_sync_concurrency} em paralelo):\n")
+            for nome, (rc, secs) in sorted(resumo.items()):
+                await send(f"    {nome:<20} {'ok' if rc == 0 else f'falhou (rc={rc})':<16} {secs:6.1f}s\n")
+        await send("\n>>> Sincronização Concluída.")
+    except Exception as e: await send(f"\n>>> Erro geral: {str(e)}")
     finally:
         db.close()
-        await websocket.send_text("\n<<<<<PROCESS_COMPLETE>>>>>")
+        orquestrador.invalidate_status(cliente_id)
+        await send("\n<<<<<PROCESS_COMPLETE>>>>>")
         await websocket.close()
 
 @app.get("/cliente/{cliente_id}/editar", response_class=HTMLResponse)
@@ -209,56 +294,107 @@ def salvar_camera_editada(camera_id: int, background_tasks: BackgroundTasks, db:
     cliente = db.query(Cliente).filter(Cliente.id == camera.cliente_id).first()
     if cliente: cliente.frigate_container_status = 'pendente'
     db.commit()
+    orquestrador.invalidate_status(camera.cliente_id)
 
     if retention_changed:
         background_tasks.add_task(trigger_event_cleanup, camera.id)
 
     return RedirectResponse(url=f"/cliente/{camera.cliente_id}", status_code=status.HTTP_303_SEE_OTHER)
 
+try:
+    from zoneinfo import ZoneInfo
+    SAO_PAULO_TZ = ZoneInfo("America/Sao_Paulo")
+except ImportError:
+    import pytz
+    SAO_PAULO_TZ = pytz.timezone("America/Sao_Paulo")
+
+def evento_view(unique_id: str, camera: str, filename: str, ts, objeto) -> dict:
+    url = f"/media_files/FRIGATE/{unique_id}/events/{camera}/{filename}"
+    if ts is None: return {"url": url, "objeto": "Desconhecido", "data": "N/A", "hora": "N/A"}
+    sp_dt = ts.astimezone(SAO_PAULO_TZ)
+    return {"url": url, "objeto": objeto or "Desconhecido", "data": sp_dt.strftime("%d/%m/%Y"), "hora": sp_dt.strftime("%H:%M:%S")}
+
+EVENTOS_PAGE_DEFAULT, EVENTOS_PAGE_MAX = 48, 200
+
+def encode_cursor(ts: datetime, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{ts.isoformat()}|{row_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(row_id)
+    except Exception: raise HTTPException(status_code=400, detail="cursor inválido")
+
+def filtro_eventos(db: Session, unique_id: str, camera: Optional[str], objeto: Optional[str], desde: Optional[date], ate: Optional[date]):
+    # datas do filtro são dias no fuso de São Paulo (o mesmo exibido na tela); ate é inclusivo
+    q = db.query(EventoCatalogo).filter(EventoCatalogo.unique_id == unique_id, EventoCatalogo.kind == "snapshot", EventoCatalogo.ts.isnot(None))
+    if camera: q = q.filter(EventoCatalogo.camera == camera)
+    if objeto: q = q.filter(EventoCatalogo.objeto == objeto)
+    if desde: q = q.filter(EventoCatalogo.ts >= datetime.combine(desde, datetime.min.time(), tzinfo=SAO_PAULO_TZ))
+    if ate: q = q.filter(EventoCatalogo.ts < datetime.combine(ate + timedelta(days=1), datetime.min.time(), tzinfo=SAO_PAULO_TZ))
+    return q
+
+def consultar_eventos(db: Session, unique_id: str, camera=None, objeto=None, desde=None, ate=None, cursor=None, limit=EVENTOS_PAGE_DEFAULT, before=None):
+    """Uma página (keyset por ts, id desc) de snapshots do catálogo; devolve (eventos, próximo cursor, cursor anterior).
+    `cursor`: página com o que é mais antigo que ele; `before`: página com o que é mais novo (volta uma página)."""
+    limit = max(1, min(limit, EVENTOS_PAGE_MAX))
+    q = filtro_eventos(db, unique_id, camera, objeto, desde, ate)
+    if before:
+        b_ts, b_id = decode_cursor(before)
+        rows = q.filter(tuple_(EventoCatalogo.ts, EventoCatalogo.id) > tuple_(b_ts, b_id)) \
+                .order_by(EventoCatalogo.ts.asc(), EventoCatalogo.id.asc()).limit(limit + 1).all()
+        # chegou ao topo: é a primeira página (cheia, sem "anterior")
+        if len(rows) <= limit: return consultar_eventos(db, unique_id, camera, objeto, desde, ate, None, limit)
+        rows = rows[:limit][::-1]
+        next_cursor, prev_cursor = encode_cursor(rows[-1].ts, rows[-1].id), encode_cursor(rows[0].ts, rows[0].id)
+    else:
+        if cursor:
+            c_ts, c_id = decode_cursor(cursor)
+            q = q.filter(tuple_(EventoCatalogo.ts, EventoCatalogo.id) < tuple_(c_ts, c_id))
+        rows = q.order_by(EventoCatalogo.ts.desc(), EventoCatalogo.id.desc()).limit(limit + 1).all()
+        next_cursor = encode_cursor(rows[limit - 1].ts, rows[limit - 1].id) if len(rows) > limit else None
+        rows = rows[:limit]
+        prev_cursor = encode_cursor(rows[0].ts, rows[0].id) if cursor and rows else None
+    eventos = [dict(evento_view(unique_id, r.camera, r.filename, r.ts, r.objeto), camera=r.camera, ts=r.ts.isoformat()) for r in rows]
+    return eventos, next_cursor, prev_cursor
+
+def contar_eventos_por_camera(db: Session, unique_id: str, camera=None, objeto=None, desde=None, ate=None) -> dict:
+    q = filtro_eventos(db, unique_id, camera, objeto, desde, ate).with_entities(EventoCatalogo.camera, func.count())
+    return dict(q.group_by(EventoCatalogo.camera).order_by(EventoCatalogo.camera).all())
+
+@app.get("/api/cliente/{cliente_id}/eventos", response_class=JSONResponse)
+def api_eventos(cliente_id: int, camera: Optional[str] = None, objeto: Optional[str] = None, desde: Optional[date] = None, ate: Optional[date] = None, cursor: Optional[str] = None, before: Optional[str] = None, limit: int = EVENTOS_PAGE_DEFAULT, db: Session = Depends(get_db)):
+    cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
+    if not cliente: raise HTTPException(status_code=404, detail="Cliente não encontrado")
+    eventos, next_cursor, prev_cursor = consultar_eventos(db, cliente.unique_id, camera, objeto, desde, ate, cursor, limit, before)
+    resp = {"eventos": eventos, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+    # contagem só na primeira página: é a mesma para todas as páginas do mesmo filtro
+    if not prev_cursor: resp["por_camera"] = contar_eventos_por_camera(db, cliente.unique_id, camera, objeto, desde, ate)
+    return resp
+
 @app.get("/cliente/{cliente_id}/eventos", response_class=HTMLResponse)
-def ver_eventos(cliente_id: int, request: Request, db: Session = Depends(get_db)):
+def ver_eventos(cliente_id: int, request: Request, camera: Optional[str] = None, objeto: Optional[str] = None, desde: Optional[date] = None, ate: Optional[date] = None, cursor: Optional[str] = None, before: Optional[str] = None, limit: int = EVENTOS_PAGE_DEFAULT, db: Session = Depends(get_db)):
     cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
     if not cliente: raise HTTPException(status_code=404, detail="Cliente não encontrado")
 
+    # snapshots vêm do catálogo (core_scripts/event_catalog.py), uma página por vez
+    eventos, next_cursor, prev_cursor = consultar_eventos(db, cliente.unique_id, camera, objeto, desde, ate, cursor, limit, before)
     eventos_por_camera = {}
-    base_event_path = f"/code/media_files/FRIGATE/{cliente.unique_id}/events"
+    for ev in eventos: eventos_por_camera.setdefault(ev["camera"], []).append(ev)
+    contagem = contar_eventos_por_camera(db, cliente.unique_id, None, objeto, desde, ate)
+    filtros = {"camera": camera or "", "objeto": objeto or "", "desde": desde.isoformat() if desde else "", "ate": ate.isoformat() if ate else "", "limit": limit}
+    base_qs = {k: v for k, v in filtros.items() if v}
+    next_url = f"/cliente/{cliente_id}/eventos?" + urlencode({**base_qs, "cursor": next_cursor}) if next_cursor else None
+    prev_url = f"/cliente/{cliente_id}/eventos?" + urlencode({**base_qs, "before": prev_cursor}) if prev_cursor else None
 
-    try:
-        from zoneinfo import ZoneInfo
-        SAO_PAULO_TZ = ZoneInfo("America/Sao_Paulo")
-    except ImportError:
-        import pytz
-        SAO_PAULO_TZ = pytz.timezone("America/Sao_Paulo")
-
-    if os.path.isdir(base_event_path):
-        for cam_dir in sorted(os.listdir(base_event_path)):
-            cam_path = os.path.join(base_event_path, cam_dir)
-            if os.path.isdir(cam_path):
-                eventos = []
-                for filename in sorted(os.listdir(cam_path), reverse=True):
-                    if filename.lower().endswith((".jpg", ".jpeg", ".png")):
-                        try:
-                            parts = os.path.splitext(filename)[0].split('_'); ts, hr, obj = parts[0], parts[1], parts[-1]
-                            utc_dt = datetime.strptime(f"{ts} {hr}", "%Y%m%d %H%M%S").replace(tzinfo=ZoneInfo("UTC"))
-                            sp_dt = utc_dt.astimezone(SAO_PAULO_TZ)
-                            eventos.append({
-                                "url": f"/media_files/FRIGATE/{cliente.unique_id}/events/{cam_dir}/{filename}",
-                                "objeto": obj, "data": sp_dt.strftime("%d/%m/%Y"), "hora": sp_dt.strftime("%H:%M:%S")
-                            })
-                        except (ValueError, IndexError):
-                            eventos.append({"url": f"/media_files/FRIGATE/{cliente.unique_id}/events/{cam_dir}/{filename}", "objeto": "Desconhecido", "data": "N/A", "hora": "N/A"})
-                if eventos: eventos_por_camera[cam_dir] = eventos
-
-    return templates.get_template("ver_eventos.html").render(request=request, cliente=cliente, eventos_por_camera=eventos_por_camera)
+    return templates.get_template("ver_eventos.html").render(request=request, cliente=cliente, eventos_por_camera=eventos_por_camera, contagem=contagem, filtros=filtros, next_url=next_url, prev_url=prev_url)
 
 
 @app.get("/stream/{unique_id}/{cam_nome_sanitizado}/{filename:path}")
-async def stream_proxy(unique_id: str, cam_nome_sanitizado: str, filename: str):
-    media_mtx_url = f"http://sistema-mediamtx:8888/live/{unique_id}/{cam_nome_sanitizado}/{filename}"
-    try:
-        req = http_client.build_request("GET", media_mtx_url  ); r = await http_client.send(req, stream=True  ); r.raise_for_status()
-        return StreamingResponse(r.aiter_bytes(), status_code=r.status_code, headers=r.headers)
-    except httpx.RequestError as e: raise HTTPException(status_code=502, detail=f"Não foi possível conectar ao MediaMTX: {e}"  )
+async def stream_proxy(unique_id: str, cam_nome_sanitizado: str, filename: str, request: Request):
+    if ".." in filename.split("/"): raise HTTPException(status_code=400, detail="caminho inválido")
+    return await hls_proxy.get(f"{unique_id}/{cam_nome_sanitizado}/{filename}", request.headers.get("range"))
 
 @app.get("/api/buscar_cliente_por_cpf", response_class=JSONResponse)
 def api_buscar_cliente_por_cpf(cpf: str, db: Session = Depends(get_db)):
@@ -274,44 +410,117 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException
 
 # ====== endpoint de health para vídeos de evento ======
 try:
+    import threading
+    from datetime import timezone
     from pathlib import Path
+    from fastapi import Query
     from fastapi.responses import JSONResponse
+    from sqlalchemy import and_, exists
+    from sqlalchemy.orm import aliased
 except Exception:
     pass
 else:
     if 'app' in globals():
+        # Contadores em memória alimentados pelo catálogo (event_catalog), não pelo disco.
+        # A cada HEALTH_TTL_SEC só as câmeras com linhas alteradas desde a última leitura são
+        # recontadas; a cada HEALTH_FULL_SEC todas (pega remoções, que não deixam rastro no
+        # updated_at). ?reconcile=1 faz a contagem lenta no disco e mostra a diferença.
+        HEALTH_TTL_SEC = float(os.environ.get("HEALTH_TTL_SEC", "30"))
+        HEALTH_FULL_SEC = float(os.environ.get("HEALTH_FULL_SEC", "600"))
+        FRIGATE_MEDIA = Path("/code/media_files/FRIGATE")
+
+        def contar_catalogo(db: Session, cameras=None) -> dict:
+            c, v = EventoCatalogo, aliased(EventoCatalogo)
+            is_jpg = and_(c.kind == "snapshot", c.filename.like("%.jpg"))
+            has_mp4 = exists().where(v.unique_id == c.unique_id, v.camera == c.camera, v.filename == c.stem + ".mp4")
+            q = db.query(c.unique_id, c.camera,
+                         func.count().filter(is_jpg), func.count().filter(c.kind.in_(("video", "merged"))),
+                         func.count().filter(and_(is_jpg, ~has_mp4)))
+            if cameras is not None: q = q.filter(tuple_(c.unique_id, c.camera).in_(cameras))
+            return {(uid, cam): {"jpg": j, "mp4": m, "missing": x} for uid, cam, j, m, x in q.group_by(c.unique_id, c.camera)}
+
+        def contar_disco(base: Path) -> dict:
+            out = {}
+            if not base.is_dir(): return out
+            with os.scandir(base) as uids:
+                for u in uids:
+                    ev = os.path.join(u.path, "events")
+                    if not u.is_dir() or not os.path.isdir(ev): continue
+                    with os.scandir(ev) as cams:
+                        for cam in cams:
+                            if not cam.is_dir(): continue
+                            with os.scandir(cam.path) as it: names = {e.name for e in it}
+                            jpgs = [n for n in names if n.endswith(".jpg")]
+                            out[(u.name, cam.name)] = {"jpg": len(jpgs), "mp4": sum(n.endswith(".mp4") for n in names),
+                                                       "missing": sum(n[:-4] + ".mp4" not in names for n in jpgs)}
+            return out
+
+        class EventVideoCounters:
+            def __init__(self):
+                self.cams, self.since, self.refreshed, self.last_full = {}, None, 0.0, 0.0
+                self.lock = threading.Lock()
+
+            def refresh(self):
+                now = time.time()
+                full = self.since is None or now - self.last_full >= HEALTH_FULL_SEC
+                db = SessionLocal()
+                try:
+                    c = EventoCatalogo
+                    newest = db.query(func.max(c.updated_at)).scalar()
+                    if full:
+                        self.cams, self.last_full = contar_catalogo(db), now
+                    elif newest and newest > self.since:
+                        touched = [tuple(r) for r in db.query(c.unique_id, c.camera).filter(c.updated_at > self.since).distinct()]
+                        fresh = contar_catalogo(db, touched)
+                        for key in touched: self.cams[key] = fresh.get(key, {"jpg": 0, "mp4": 0, "missing": 0})
+                    # folga: transação que commitou depois com now() anterior ainda é vista
+                    if newest: self.since = newest - timedelta(seconds=5)
+                finally:
+                    db.close()
+                self.refreshed = now
+
+            def snapshot(self) -> dict:
+                # quem chega com o cache vencido e outro já recalculando recebe o valor anterior
+                if time.time() - self.refreshed >= HEALTH_TTL_SEC and self.lock.acquire(blocking=self.refreshed == 0.0):
+                    try: self.refresh()
+                    except Exception as e: print(f"ERRO: health event-videos: {e}")  # serve o último valor
+                    finally: self.lock.release()
+                return {"cams": dict(self.cams), "refreshed": self.refreshed}
+
+        EVENT_VIDEO_COUNTERS = EventVideoCounters()
+
+        def resumo_contadores(cams: dict) -> dict:
+            total, clientes = {"jpg": 0, "mp4": 0, "missing": 0}, {}
+            for (uid, cam), n in sorted(cams.items()):
+                cli = clientes.setdefault(uid, {"jpg": 0, "mp4": 0, "missing": 0, "cameras": {}})
+                cli["cameras"][cam] = n
+                for k, val in n.items(): cli[k] += val; total[k] += val
+            return dict(total, per_client=clientes)
+
         @app.get("/health/event-videos")
-        def health_event_videos():
-            base = Path("/code/media_files/FRIGATE")
-            jpg = mp4 = missing = 0
-            if base.exists():
-                for p in base.rglob("events/*/*.jpg"):
-                    jpg += 1
-                    if not p.with_suffix(".mp4").exists():
-                        missing += 1
-                for _ in base.rglob("events/*/*.mp4"):
-                    mp4 += 1
-            return JSONResponse({
-                "ok": True,
-                "base": str(base),
-                "jpg": jpg,
-                "mp4": mp4,
-                "missing": missing
-            })
+        def health_event_videos(reconcile: bool = Query(False, description="conta no disco (lento)")):
+            snap = EVENT_VIDEO_COUNTERS.snapshot()
+            resp = {"ok": True, "base": str(FRIGATE_MEDIA), "source": "catalog", **resumo_contadores(snap["cams"]),
+                    "updated_at": datetime.fromtimestamp(snap["refreshed"], tz=timezone.utc).isoformat() if snap["refreshed"] else None,
+                    "age_s": round(time.time() - snap["refreshed"], 1) if snap["refreshed"] else None}
+            if reconcile:
+                disk = contar_disco(FRIGATE_MEDIA)
+                resp["disk"] = resumo_contadores(disk)
+                resp["drift"] = {f"{uid}/{cam}": {"catalog": snap["cams"].get((uid, cam)), "disk": disk.get((uid, cam))}
+                                 for uid, cam in sorted(set(disk) | set(snap["cams"])) if disk.get((uid, cam)) != snap["cams"].get((uid, cam))}
+            return JSONResponse(resp)
 # ====== fim endpoint ======
 
 # ====== endpoint utilitário: descobrir vídeo de um snapshot (.mp4 exato ou *_merged.mp4) ======
 try:
     import re, os
     from pathlib import Path
-    from fastapi import Query
+    from fastapi import Query, Body
     from fastapi.responses import JSONResponse
 except Exception:
     pass
 else:
     if 'app' in globals():
-        _TS_RE = re.compile(r'(?P<ts>\d{8}_\d{6})')
-
         def _to_rel_from_frigate(p: str) -> str:
             # aceita urls (/media_files/FRIGATE/... ou /FRIGATE/...), caminho host (/home/.../FRIGATE/...), ou relativo
             p = p.strip()
@@ -330,38 +539,62 @@ else:
                 return p.split("/FRIGATE/",1)[1]
             return p.lstrip("/")
 
+        # Resolução pelo índice: .mp4 exato = linha do event_catalog com stem + ".mp4"; merged =
+        # event_video_link (snapshot -> *_merged.mp4, gravado pelo merge). Nada de resolve/glob
+        # no diretório da câmera; o disco só é consultado (um stat) quando o índice não conhece o vídeo.
+        EVENT_VIDEO_BATCH_MAX = 500
+
+        def _split_rel(rel: str):
+            # <unique_id>/events/<camera>/<arquivo>.jpg; qualquer outra forma (inclusive "..") é recusada
+            parts = rel.split("/")
+            if len(parts) != 4 or parts[1] != "events" or any(p in ("", ".", "..") for p in parts) or not parts[3].endswith(".jpg"):
+                return None
+            return parts[0], parts[2], parts[3]
+
+        def resolver_videos(db: Session, keys) -> dict:
+            """{(uid, camera, jpg): (arquivo do vídeo, modo)} para os snapshots que têm vídeo no índice."""
+            keys = list(set(keys))
+            if not keys: return {}
+            out = {}
+            mp4s = {(uid, cam, jpg[:-4] + ".mp4"): (uid, cam, jpg) for uid, cam, jpg in keys}
+            c, l = EventoCatalogo, EventoVideoLink
+            for uid, cam, fn in db.query(c.unique_id, c.camera, c.filename).filter(
+                    c.kind == "video", tuple_(c.unique_id, c.camera, c.filename).in_(list(mp4s))):
+                out[mp4s[(uid, cam, fn)]] = (fn, "exact")
+            rest = [k for k in keys if k not in out]
+            if rest:
+                for uid, cam, snap, video in db.query(l.unique_id, l.camera, l.snapshot, l.video).filter(
+                        tuple_(l.unique_id, l.camera, l.snapshot).in_(rest)).order_by(l.video):
+                    out.setdefault((uid, cam, snap), (video, "merged"))
+            return out
+
+        def _video_resp(jpg: str, key, found: dict):
+            if key is None: return {"ok": False, "error": "forbidden", "jpg": jpg}, 403
+            uid, cam, name = key
+            url_dir = f"/media_files/FRIGATE/{uid}/events/{cam}/"
+            if key in found:
+                video, mode = found[key]
+                return {"ok": True, "url": url_dir + video, "mode": mode, "tried": ["index"]}, 200
+            # índice atrasado (catálogo desativado no host, reconcile pendente): um stat no .mp4 exato
+            cam_dir = FRIGATE_MEDIA / uid / "events" / cam
+            if (cam_dir / (name[:-4] + ".mp4")).exists():
+                return {"ok": True, "url": url_dir + name[:-4] + ".mp4", "mode": "exact", "tried": ["index", "disk"]}, 200
+            if not (cam_dir / name).exists():
+                return {"ok": False, "error": "jpg_not_found", "path": url_dir + name}, 404
+            return {"ok": False, "error": "video_not_found", "tried": ["index", "disk"]}, 404
+
         @app.get("/api/event-video")
-        def api_event_video(jpg: str = Query(..., description="caminho do .jpg (url ou fs)")):
-            base = Path("/code/media_files/FRIGATE").resolve()
-            rel = _to_rel_from_frigate(jpg)
-            fs_jpg = (base / rel).resolve()
-
-            # segurança: precisa estar dentro de base
-            if not str(fs_jpg).startswith(str(base)):
-                return JSONResponse({"ok": False, "error": "forbidden"}, status_code=403)
-
-            if not fs_jpg.exists():
-                return JSONResponse({"ok": False, "error": "jpg_not_found", "path": f"/media_files/FRIGATE/{rel}"}, status_code=404)
-
-            tried = []
-            # 1) .mp4 exato
-            mp4_exact = fs_jpg.with_suffix(".mp4")
-            tried.append(str(mp4_exact))
-            if mp4_exact.exists():
-                url = "/media_files/FRIGATE/" + os.path.relpath(mp4_exact, base)
-                return JSONResponse({"ok": True, "url": url, "mode": "exact", "tried": tried})
-
-            # 2) procurar *_merged.mp4 com mesmo timestamp inicial
-            m = _TS_RE.search(fs_jpg.name)
-            if m:
-                ts = m.group("ts")
-                dirp = fs_jpg.parent
-                candidates = sorted(dirp.glob(f"{ts}__*_merged.mp4"))
-                for c in candidates:
-                    tried.append(str(c))
-                    if c.exists():
-                        url = "/media_files/FRIGATE/" + os.path.relpath(c, base)
-                        return JSONResponse({"ok": True, "url": url, "mode": "merged", "tried": tried})
-
-            return JSONResponse({"ok": False, "error": "video_not_found", "tried": tried}, status_code=404)
+        def api_event_video(jpg: str = Query(..., description="caminho do .jpg (url ou fs)"), db: Session = Depends(get_db)):
+            key = _split_rel(_to_rel_from_frigate(jpg))
+            body, code = _video_resp(jpg, key, resolver_videos(db, [key] if key else []))
+            return JSONResponse(body, status_code=code)
+
+        @app.post("/api/event-video/batch")
+        def api_event_video_batch(payload: dict = Body(..., description='{"jpgs": [caminhos .jpg]}'), db: Session = Depends(get_db)):
+            jpgs = payload.get("jpgs") or []
+            if not isinstance(jpgs, list) or len(jpgs) > EVENT_VIDEO_BATCH_MAX:
+                raise HTTPException(status_code=400, detail=f"jpgs: lista de até {EVENT_VIDEO_BATCH_MAX} caminhos")
+            keys = {j: _split_rel(_to_rel_from_frigate(str(j))) for j in jpgs}
+            found = resolver_videos(db, [k for k in keys.values() if k])
+            return {"results": {j: _video_resp(j, k, found)[0] for j, k in keys.items()}}
 # ====== fim endpoint utilitário ======
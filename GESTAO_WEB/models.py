@@ -1,4 +1,4 @@
-from sqlalchemy import (Column, Integer, String, ForeignKey, Boolean, UniqueConstraint)
+from sqlalchemy import (Column, Integer, BigInteger, String, DateTime, ForeignKey, Boolean, UniqueConstraint, Index, func)
 from sqlalchemy.orm import relationship, declarative_base
 
 Base = declarative_base()
@@ -42,3 +42,40 @@ class Camera(Base):
     ia_event_retention_days = Column(Integer, nullable=False, default=7)
 
     cliente = relationship("Cliente", back_populates="cameras")
+
+class EventoCatalogo(Base):
+    # Catálogo dos arquivos de evento em FRIGATE/<unique_id>/events/<camera>/, mantido pelos
+    # core_scripts (assembler, merge, cleaner). A tela de eventos consulta aqui em vez de listar diretórios.
+    __tablename__ = 'event_catalog'
+    id = Column(BigInteger, primary_key=True)
+    unique_id = Column(String(20), nullable=False)
+    camera = Column(String(50), nullable=False)
+    kind = Column(String(10), nullable=False)  # snapshot | video | merged | meta
+    filename = Column(String(255), nullable=False)
+    stem = Column(String(255), nullable=False)
+    ts = Column(DateTime(timezone=True), nullable=True)  # UTC, do nome do arquivo
+    ts_end = Column(DateTime(timezone=True), nullable=True)
+    objeto = Column(String(50), nullable=True)
+    size = Column(BigInteger, nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('unique_id', 'camera', 'filename', name='uq_event_catalog_file'),
+        Index('ix_event_catalog_cam_kind_ts', 'unique_id', 'camera', 'kind', 'ts'),
+        Index('ix_event_catalog_uid_kind_ts', 'unique_id', 'kind', 'ts'),
+    )
+
+class EventoVideoLink(Base):
+    # snapshot -> *_merged.mp4 que o cobre, gravado pelo event_merge_host.py a partir das `sources`
+    # do grupo (e pelo reconcile do catálogo). O .mp4 exato sai do próprio event_catalog.
+    __tablename__ = 'event_video_link'
+    id = Column(BigInteger, primary_key=True)
+    unique_id = Column(String(20), nullable=False)
+    camera = Column(String(50), nullable=False)
+    snapshot = Column(String(255), nullable=False)
+    video = Column(String(255), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('unique_id', 'camera', 'snapshot', 'video', name='uq_event_video_link'),
+        Index('ix_event_video_link_video', 'unique_id', 'camera', 'video'),
+    )
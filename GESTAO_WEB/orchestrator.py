@@ -0,0 +1,112 @@
+import asyncio, itertools, time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+# Orquestração do Frigate/YOLO dentro do app: os scripts de gerenciamento rodam como subprocessos
+# assíncronos (sem prender worker do threadpool), as operações longas viram jobs numa fila com
+# workers próprios e o status do Frigate é cacheado por alguns segundos.
+#  - Mesma operação para o mesmo alvo já na fila/rodando: devolve o job existente.
+#  - Jobs do mesmo cliente rodam um por vez (remover câmera x remover cliente não se cruzam).
+#  - Vários polls simultâneos de /status esperam a mesma consulta.
+
+async def run_script(*args: str, timeout: float) -> Tuple[int, str, str]:
+    """python3 <args> sem bloquear o loop; no timeout o processo é morto e rc = -1."""
+    proc = await asyncio.create_subprocess_exec("python3", *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill(); await proc.wait()
+        return -1, "", f"timeout após {timeout:g}s"
+    return proc.returncode, out.decode(errors="replace"), err.decode(errors="replace")
+
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(self, kind: str, key: Tuple, cliente_id: int, fn: Callable[["Job"], Awaitable[None]]):
+        self.id, self.kind, self.key, self.cliente_id, self.fn = next(Job._ids), kind, key, cliente_id, fn
+        self.status, self.log, self.error = "na_fila", [], None
+        self.created, self.started, self.finished = time.time(), None, None
+
+    def info(self, msg: str):
+        self.log.append(msg)
+
+    def as_dict(self) -> dict:
+        return {"id": self.id, "tipo": self.kind, "cliente_id": self.cliente_id, "status": self.status, "erro": self.error,
+                "log": self.log, "criado": self.created, "inicio": self.started, "fim": self.finished}
+
+class Orchestrator:
+    def __init__(self, workers: int = 2, job_ttl: float = 900, status_ttl: float = 5):
+        self.workers, self.job_ttl, self.status_ttl = workers, job_ttl, status_ttl
+        self.jobs: Dict[int, Job] = {}
+        self.inflight: Dict[Tuple, Job] = {}
+        self.client_locks: Dict[int, asyncio.Lock] = {}
+        self.status_cache: Dict[int, Tuple[float, dict]] = {}
+        self.status_pending: Dict[int, asyncio.Future] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.tasks = []
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for t in self.tasks: t.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    # ---- jobs ----
+    def submit(self, kind: str, target: int, cliente_id: int, fn: Callable[[Job], Awaitable[None]]) -> Job:
+        key = (kind, target)
+        job = self.inflight.get(key)
+        if job: return job
+        self._purge()
+        job = Job(kind, key, cliente_id, fn)
+        self.jobs[job.id] = self.inflight[key] = job
+        self.queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: int) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def jobs_do_cliente(self, cliente_id: int):
+        return [j for j in self.jobs.values() if j.cliente_id == cliente_id]
+
+    def _purge(self):
+        limit = time.time() - self.job_ttl
+        for jid in [jid for jid, j in self.jobs.items() if j.finished and j.finished < limit]: del self.jobs[jid]
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            lock = self.client_locks.setdefault(job.cliente_id, asyncio.Lock())
+            try:
+                async with lock:
+                    job.status, job.started = "executando", time.time()
+                    await job.fn(job)
+                    job.status = "concluido"
+            except asyncio.CancelledError: raise
+            except Exception as e:
+                job.status, job.error = "erro", str(e)
+                print(f"ERRO: job {job.kind} #{job.id}: {e}")
+            finally:
+                job.finished = time.time()
+                self.inflight.pop(job.key, None)
+                self.invalidate_status(job.cliente_id)
+                self.queue.task_done()
+
+    # ---- status com cache curto e consulta compartilhada ----
+    def invalidate_status(self, cliente_id: int):
+        self.status_cache.pop(cliente_id, None)
+
+    async def status(self, cliente_id: int, probe: Callable[[int], Awaitable[dict]]) -> dict:
+        hit = self.status_cache.get(cliente_id)
+        if hit and time.monotonic() - hit[0] < self.status_ttl: return hit[1]
+        fut = self.status_pending.get(cliente_id)
+        if fut is None:
+            fut = self.status_pending[cliente_id] = asyncio.ensure_future(probe(cliente_id))
+            fut.add_done_callback(lambda f: self._status_done(cliente_id, f))
+        return await asyncio.shield(fut)
+
+    def _status_done(self, cliente_id: int, fut: asyncio.Future):
+        self.status_pending.pop(cliente_id, None)
+        if not fut.cancelled() and fut.exception() is None:
+            self.status_cache[cliente_id] = (time.monotonic(), fut.result())
@@ -0,0 +1,134 @@
+import json, os, time, threading
+from contextlib import contextmanager
+import psycopg2
+
+# Pool de conexões compartilhado pelos workers: limitado, com health-check na retirada,
+# reconexão transparente e métricas (em uso, esperas, latência de checkout).
+
+class PoolTimeout(Exception):
+    pass
+
+class Pool:
+    def __init__(self, dsn:str, minconn:int=1, maxconn:int=5, timeout:float=10.0, check_idle_sec:float=30.0):
+        self.dsn, self.minconn, self.maxconn = dsn, max(0, minconn), max(1, maxconn)
+        self.timeout, self.check_idle_sec = timeout, check_idle_sec
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._lock = threading.Lock()
+        self._idle = []  # [(conn, último uso monotonic)]
+        self._in_use = 0
+        self._m = {"checkouts": 0, "waits": 0, "timeouts": 0, "connects": 0, "reconnects": 0,
+                   "discarded": 0, "checkout_ms_total": 0.0, "checkout_ms_max": 0.0}
+        for _ in range(min(self.minconn, self.maxconn)):
+            try: self._idle.append((self._connect(), time.monotonic()))
+            except Exception: break  # banco ainda subindo: conecta sob demanda
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn)
+        with self._lock: self._m["connects"] += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._lock: self._m["discarded"] += 1
+        try: conn.close()
+        except Exception: pass
+
+    def _healthy(self, conn, idle_since:float) -> bool:
+        if conn.closed: return False
+        if time.monotonic() - idle_since < self.check_idle_sec: return True
+        try:
+            with conn.cursor() as cur: cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                item = self._idle.pop() if self._idle else None
+            if item is None: return self._connect()
+            conn, idle_since = item
+            if self._healthy(conn, idle_since): return conn
+            self._discard(conn)
+            with self._lock: self._m["reconnects"] += 1
+
+    def _checkin(self, conn, broken:bool):
+        if broken or conn.closed:
+            self._discard(conn); return
+        with self._lock:
+            if len(self._idle) < self.maxconn: self._idle.append((conn, time.monotonic())); return
+        self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        t0 = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            with self._lock: self._m["waits"] += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock: self._m["timeouts"] += 1
+                raise PoolTimeout(f"nenhuma conexão livre em {self.timeout}s (max={self.maxconn})")
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release(); raise
+        ms = (time.monotonic() - t0) * 1000.0
+        with self._lock:
+            self._in_use += 1
+            self._m["checkouts"] += 1
+            self._m["checkout_ms_total"] += ms
+            self._m["checkout_ms_max"] = max(self._m["checkout_ms_max"], ms)
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except Exception as e:
+            broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+            try: conn.rollback()
+            except Exception: broken = True
+            raise
+        finally:
+            with self._lock: self._in_use -= 1
+            self._checkin(conn, broken)
+            self._slots.release()
+
+    @contextmanager
+    def cursor(self):
+        with self.connection() as conn, conn.cursor() as cur:
+            yield cur
+
+    def stats(self) -> dict:
+        with self._lock:
+            m = dict(self._m)
+            m.update(in_use=self._in_use, idle=len(self._idle), max=self.maxconn)
+        m["checkout_ms_avg"] = round(m.pop("checkout_ms_total") / m["checkouts"], 3) if m["checkouts"] else 0.0
+        m["checkout_ms_max"] = round(m["checkout_ms_max"], 3)
+        return m
+
+    def close(self):
+        with self._lock: idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            try: conn.close()
+            except Exception: pass
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> Pool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = Pool(os.environ["DB_URL"],
+                         minconn=int(os.getenv("DB_POOL_MIN", "1")),
+                         maxconn=int(os.getenv("DB_POOL_MAX", "4")),
+                         timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                         check_idle_sec=float(os.getenv("DB_POOL_CHECK_IDLE_SEC", "30")))
+        return _pool
+
+def start_stats_logger(worker_id:str, every:int|None=None):
+    every = int(os.getenv("DB_POOL_STATS_SEC", "60")) if every is None else every
+    if every <= 0: return
+    def loop():
+        while True:
+            time.sleep(every)
+            print(f"[{worker_id}] db-pool {json.dumps(get_pool().stats())}", flush=True)
+    threading.Thread(target=loop, daemon=True).start()
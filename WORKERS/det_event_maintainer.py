@@ -0,0 +1,121 @@
+import os, time, socket, traceback
+from datetime import date, datetime, timedelta, timezone
+import psycopg2
+from dbpool import get_pool
+
+WORKER_ID = os.environ.get("WORKER_ID", f"det-maint-{socket.gethostname()}")
+INTERVAL       = int(os.getenv("DET_EVENT_MAINT_INTERVAL", "3600"))
+PREMAKE_DAYS   = int(os.getenv("DET_EVENT_PREMAKE_DAYS", "7"))
+# usado quando não há câmeras com retenção configurada
+DEFAULT_RETENTION_DAYS = int(os.getenv("DET_EVENT_RETENTION_DAYS", "30"))
+# DROP pega ACCESS EXCLUSIVE em det_event: se não sair logo, desiste e tenta no próximo ciclo
+# em vez de enfileirar os inserts do ingestor atrás dele
+DROP_LOCK_TIMEOUT = os.getenv("DET_EVENT_DROP_LOCK_TIMEOUT", "5s")
+LOCK_KEY = 740_202  # um maintainer por vez
+
+POOL = get_pool()
+
+def premake(conn, today:date) -> int:
+    # um dia por transação: um dia que falha não impede os outros nem a retenção
+    made = 0
+    for i in range(PREMAKE_DAYS + 1):
+        day = today + timedelta(days=i)
+        try:
+            with conn.cursor() as cur: cur.execute("SELECT det_event_ensure_partition(%s)", (day,))
+            conn.commit(); made += 1
+        except psycopg2.Error as e:
+            conn.rollback()
+            print(f"[{WORKER_ID}] ERRO ao criar partição de {day}: {e}", flush=True)
+    return made
+
+def retention_rules(cur) -> dict:
+    # camera_id -> dias (cameras.ia_event_retention_days, tabela do GESTAO_WEB)
+    cur.execute("SELECT to_regclass('cameras') IS NOT NULL")
+    if not cur.fetchone()[0]: return {}
+    cur.execute("SELECT id, ia_event_retention_days FROM cameras WHERE ia_event_retention_days IS NOT NULL")
+    return {cam: int(days) for cam, days in cur.fetchall()}
+
+def daily_partitions(cur) -> list:
+    cur.execute("""
+        SELECT c.relname FROM pg_inherits i
+          JOIN pg_class c ON c.oid = i.inhrelid
+         WHERE i.inhparent = 'det_event'::regclass AND c.relname ~ '^det_event_p[0-9]{8}$'
+    """)
+    out = []
+    for (name,) in cur.fetchall():
+        out.append((datetime.strptime(name[-8:], "%Y%m%d").date(), name))
+    return sorted(out)
+
+def drop_expired(conn, today:date, keep_days:int) -> list:
+    # só partições inteiras além da maior retenção; o resto é DELETE pontual abaixo.
+    # cada DROP na sua transação, para o lock em det_event durar só o DROP
+    cutoff = today - timedelta(days=keep_days)
+    with conn.cursor() as cur: parts = daily_partitions(cur)
+    conn.commit()
+    dropped = []
+    for day, name in parts:
+        if day + timedelta(days=1) > cutoff: break
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL lock_timeout = %s", (DROP_LOCK_TIMEOUT,))
+                cur.execute(f'DROP TABLE IF EXISTS "{name}"')
+            conn.commit()
+        except psycopg2.OperationalError as e:
+            conn.rollback()
+            if e.pgcode != "55P03": raise  # lock_not_available
+            print(f"[{WORKER_ID}] {name} ocupada; DROP fica para o próximo ciclo", flush=True)
+            break
+        dropped.append(name)
+    return dropped
+
+def trim_short_retention(cur, rules:dict, keep_days:int) -> int:
+    # câmeras com retenção menor que a largura mantida: apaga só o excedente delas.
+    # os limites constantes de ts deixam o planner podar as partições fora da janela.
+    short = {cam: d for cam, d in rules.items() if d < keep_days}
+    if not short: return 0
+    now = datetime.now(timezone.utc)
+    cur.execute("""
+        DELETE FROM det_event e
+         USING unnest(%s::int[], %s::int[]) AS r(camera_id, days)
+         WHERE e.camera_id = r.camera_id
+           AND e.ts < %s::timestamptz - make_interval(days => r.days)
+           AND e.ts < %s AND e.ts >= %s
+    """, (list(short), list(short.values()), now,
+          now - timedelta(days=min(short.values())), now - timedelta(days=keep_days + 1)))
+    return cur.rowcount
+
+def run_once():
+    today = datetime.now(timezone.utc).date()
+    # lock de sessão (não de transação): cada etapa abaixo faz commit próprio
+    with POOL.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (LOCK_KEY,))
+            got = cur.fetchone()[0]
+        conn.commit()
+        if not got:
+            print(f"[{WORKER_ID}] outro maintainer em execução; pulando", flush=True); return
+        try:
+            made = premake(conn, today)
+            with conn.cursor() as cur: rules = retention_rules(cur)
+            conn.commit()
+            keep_days = max(rules.values()) if rules else DEFAULT_RETENTION_DAYS
+            dropped = drop_expired(conn, today, keep_days)
+            with conn.cursor() as cur: deleted = trim_short_retention(cur, rules, keep_days)
+            conn.commit()
+        finally:
+            conn.rollback()
+            with conn.cursor() as cur: cur.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+            conn.commit()
+    print(f"[{WORKER_ID}] det_event: {made}/{PREMAKE_DAYS + 1} partições garantidas, retenção máx={keep_days}d, "
+          f"partições removidas={len(dropped)} {dropped if dropped else ''} linhas apagadas={deleted}", flush=True)
+
+def run():
+    while True:
+        try:
+            run_once()
+        except Exception as e:
+            print(f"[{WORKER_ID}] ERRO MAINT: {e}\n{traceback.format_exc()}", flush=True)
+        time.sleep(INTERVAL)
+
+if __name__ == "__main__":
+    run()
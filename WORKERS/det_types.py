@@ -0,0 +1,49 @@
+import threading
+import psycopg2.errors
+
+# Cache local (por processo) de detection_type.name -> id.
+# Pré-carregado no startup; um miss faz SELECT e só insere se o tipo realmente não existir.
+# Se o banco rejeitar um id do cache (FK), o cache é descartado e a msg volta pra fila.
+
+class DetTypeCache:
+    def __init__(self):
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def preload(self, cur):
+        cur.execute("SELECT name, id FROM detection_type")
+        ids = dict(cur.fetchall())
+        with self._lock: self._ids = ids
+        return len(ids)
+
+    def get_id(self, cur, name:str) -> int:
+        det_id = self._ids.get(name)
+        if det_id is not None: return det_id
+        cur.execute("SELECT id FROM detection_type WHERE name=%s", (name,))
+        row = cur.fetchone()
+        if row is None:
+            cur.execute("INSERT INTO detection_type(name) VALUES (%s) ON CONFLICT (name) DO NOTHING RETURNING id", (name,))
+            row = cur.fetchone()
+            if row is None:  # inserido por outro processo entre o SELECT e o INSERT
+                cur.execute("SELECT id FROM detection_type WHERE name=%s", (name,))
+                row = cur.fetchone()
+        with self._lock: self._ids[name] = row[0]
+        return row[0]
+
+    def invalidate(self, name:str|None=None):
+        with self._lock:
+            if name is None: self._ids = {}
+            else: self._ids.pop(name, None)
+
+    def on_error(self, exc:Exception):
+        # id em cache apontando para linha inexistente (tipo removido, ou insert revertido)
+        if isinstance(exc, psycopg2.errors.ForeignKeyViolation): self.invalidate()
+
+DET_TYPES = DetTypeCache()
+
+def preload(pool, worker_id:str):
+    try:
+        with pool.cursor() as cur: n = DET_TYPES.preload(cur)
+        print(f"[{worker_id}] detection_type em cache: {n}", flush=True)
+    except Exception as e:
+        print(f"[{worker_id}] cache detection_type vazio (carrega sob demanda): {e}", flush=True)
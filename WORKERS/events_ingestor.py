@@ -1,53 +1,136 @@
-import json, os, time, socket, traceback
-import pika, psycopg2
+import json, os, math, time, socket, traceback
+from datetime import datetime, timezone
+import pika
+import psycopg2
+from psycopg2.extras import execute_values
+from dbpool import get_pool, start_stats_logger
+from det_types import DET_TYPES, preload as preload_det_types
 
 BROKER_URL = os.environ["BROKER_URL"]
-DB_URL     = os.environ["DB_URL"]
 WORKER_ID  = os.environ.get("WORKER_ID", f"ingestor-{socket.gethostname()}")
 
-def db():
-    return psycopg2.connect(DB_URL)
+# lote: grava quando juntar BATCH_SIZE msgs ou quando a 1a msg do lote tiver FLUSH_MS de idade
+BATCH_SIZE = max(1, int(os.getenv("EVENTS_BATCH_SIZE", "200")))
+FLUSH_MS   = max(1, int(os.getenv("EVENTS_FLUSH_MS", "250")))
+PREFETCH   = max(BATCH_SIZE, int(os.getenv("EVENTS_PREFETCH", "50")))
 
-def get_det_id(cur, det_name:str) -> int:
-    cur.execute("INSERT INTO detection_type(name) VALUES (%s) ON CONFLICT (name) DO NOTHING", (det_name,))
-    cur.execute("SELECT id FROM detection_type WHERE name=%s", (det_name,))
-    return cur.fetchone()[0]
+POOL = get_pool()
 
-def insert_event(cur, ev:dict):
-    det_id = get_det_id(cur, ev["detection_type"])
-    cur.execute("""
-        INSERT INTO det_event(event_id, camera_id, detection_type_id, ts, cls, conf)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        ON CONFLICT DO NOTHING
-    """, (
+INT4_MAX = 2**31 - 1
+
+def parse_ts(v) -> datetime:
+    # epoch (s) ou ISO 8601; sem fuso = UTC
+    if isinstance(v, (int, float)) and not isinstance(v, bool): ts = datetime.fromtimestamp(v, tz=timezone.utc)
+    elif isinstance(v, str): ts = datetime.fromisoformat(v.replace("Z", "+00:00"))
+    else: raise ValueError(f"ts inválido: {v!r}")
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+def event_row(ev:dict) -> tuple:
+    # valida/converte na chegada: uma msg inválida não derruba o lote inteiro
+    camera_id, conf = int(ev["camera_id"]), float(ev.get("conf", 0.0))
+    if not 0 < camera_id <= INT4_MAX: raise ValueError(f"camera_id fora da faixa: {camera_id}")
+    if not math.isfinite(conf): raise ValueError(f"conf inválido: {conf}")
+    return (
         ev.get("event_id"),
-        int(ev["camera_id"]),
-        det_id,
-        ev["ts"],
+        camera_id,
+        str(ev["detection_type"]),
+        parse_ts(ev["ts"]),
         ev.get("cls"),
-        float(ev.get("conf", 0.0)),
-    ))
+        conf,
+    )
+
+def insert_events(cur, rows:list):
+    det_ids = {name: DET_TYPES.get_id(cur, name) for name in sorted({r[2] for r in rows})}
+    execute_values(cur, """
+        INSERT INTO det_event(event_id, camera_id, detection_type_id, ts, cls, conf)
+        VALUES %s
+        ON CONFLICT DO NOTHING
+    """, [(r[0], r[1], det_ids[r[2]], r[3], r[4], r[5]) for r in rows], page_size=len(rows))
+
+# erros causados pelo conteúdo de uma linha (não pela conexão/banco): essa linha nunca vai entrar
+ROW_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError)
+
+def insert_split(items:list):
+    """Grava [(tag, row, body)]; se o lote falhar por causa de dados, divide ao meio até isolar as linhas
+    ruins. Devolve (gravados, [(item, erro)]). Erro de conexão/banco sobe: o lote todo volta pra fila."""
+    try:
+        with POOL.cursor() as cur: insert_events(cur, [item[1] for item in items])
+        return items, []
+    except ROW_ERRORS as e:
+        DET_TYPES.on_error(e)
+        if len(items) == 1: return [], [(items[0], str(e).strip())]
+    mid = len(items) // 2
+    ok1, bad1 = insert_split(items[:mid])
+    ok2, bad2 = insert_split(items[mid:])
+    return ok1 + ok2, bad1 + bad2
+
+def save_rejects(rejects:list):
+    """[(body, event_id, erro)] -> det_event_reject; só depois disso a msg sai da fila."""
+    with POOL.cursor() as cur:
+        execute_values(cur, "INSERT INTO det_event_reject(worker_id, event_id, error, payload) VALUES %s",
+                       [(WORKER_ID, event_id, err, body.decode("utf-8", errors="replace")) for body, event_id, err in rejects])
+    for _, event_id, err in rejects:
+        print(f"[{WORKER_ID}] rejeitado (det_event_reject) event_id={event_id}: {err}", flush=True)
 
 def main():
+    start_stats_logger(WORKER_ID)
+    preload_det_types(POOL, WORKER_ID)
     params = pika.URLParameters(BROKER_URL)
     while True:
         try:
             conn = pika.BlockingConnection(params)
             ch = conn.channel()
             ch.queue_declare(queue="det.events", durable=True)
-            ch.basic_qos(prefetch_count=50)
-            print(f"[{WORKER_ID}] aguardando msgs em det.events", flush=True)
+            ch.basic_qos(prefetch_count=PREFETCH)
+            print(f"[{WORKER_ID}] aguardando msgs em det.events (lote={BATCH_SIZE} flush={FLUSH_MS}ms prefetch={PREFETCH})", flush=True)
+            batch = {"items": [], "deadline": 0.0}
+
+            def flush():
+                items = batch["items"]
+                if not items: return
+                batch["items"] = []
+                try:
+                    ok, bad = insert_split(items)
+                except Exception as e:
+                    DET_TYPES.on_error(e)
+                    print(f"[{WORKER_ID}] ERRO lote n={len(items)}: {e}\n{traceback.format_exc()}", flush=True)
+                    ch.basic_nack(delivery_tag=items[-1][0], multiple=True, requeue=True)
+                    return
+                if bad:
+                    # lote com linha envenenada: as boas já estão gravadas, as ruins vão para det_event_reject
+                    try:
+                        save_rejects([(item[2], item[1][0], err) for item, err in bad])
+                    except Exception as e:
+                        print(f"[{WORKER_ID}] ERRO ao gravar rejeitadas n={len(bad)}: {e}", flush=True)
+                        for item in ok: ch.basic_ack(delivery_tag=item[0])
+                        for item, _ in bad: ch.basic_nack(delivery_tag=item[0], requeue=True)
+                        return
+                ch.basic_ack(delivery_tag=items[-1][0], multiple=True)
+
             def on_msg(chx, method, props, body):
+                ev = None
                 try:
                     ev = json.loads(body.decode("utf-8"))
-                    with db() as dbc, dbc.cursor() as cur:
-                        insert_event(cur, ev)
-                    chx.basic_ack(delivery_tag=method.delivery_tag)
+                    row = event_row(ev)
                 except Exception as e:
-                    print(f"[{WORKER_ID}] ERRO: {e}\n{traceback.format_exc()}", flush=True)
-                    chx.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+                    # msg malformada nunca vai ficar válida: vai para det_event_reject em vez de voltar em loop
+                    event_id = ev.get("event_id") if isinstance(ev, dict) else None
+                    try: save_rejects([(body, event_id, f"{type(e).__name__}: {e}")])
+                    except Exception as e2:
+                        print(f"[{WORKER_ID}] ERRO ao gravar rejeitada: {e2}", flush=True)
+                        chx.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+                        return
+                    chx.basic_ack(delivery_tag=method.delivery_tag)
+                    return
+                if not batch["items"]: batch["deadline"] = time.monotonic() + FLUSH_MS / 1000.0
+                batch["items"].append((method.delivery_tag, row, body))
+                if len(batch["items"]) >= BATCH_SIZE: flush()
+
             ch.basic_consume(queue="det.events", on_message_callback=on_msg, auto_ack=False)
-            ch.start_consuming()
+            while True:
+                wait = max(0.0, batch["deadline"] - time.monotonic()) if batch["items"] else 1.0
+                conn.process_data_events(time_limit=wait)
+                if batch["items"] and time.monotonic() >= batch["deadline"]: flush()
         except Exception as e:
             print(f"[{WORKER_ID}] conexão perdida: {e}; retry em 1s", flush=True)
             time.sleep(1)
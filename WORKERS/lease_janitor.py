@@ -1,23 +1,63 @@
-import os, time, socket, traceback
+import os, time, select, socket, traceback
 import psycopg2
+from dbpool import get_pool, start_stats_logger
 
-DB_URL = os.environ["DB_URL"]
 WORKER_ID = os.environ.get("WORKER_ID", f"janitor-{socket.gethostname()}")
-INTERVAL = int(os.getenv("JANITOR_INTERVAL", "5"))
+# dorme até o próximo lease_until; MAX_SLEEP é só a rede de segurança (NOTIFY perdido, relógio)
+MAX_SLEEP = float(os.getenv("JANITOR_MAX_SLEEP", "60"))
+NOTIFY_CHANNEL = "assignment_lease"
+
+POOL = get_pool()
+
+# índice parcial e triggers de NOTIFY: BANCO/migrations/0002_assignment_lease_expiry.sql
+
+def next_deadline(cur):
+    cur.execute("SELECT EXTRACT(EPOCH FROM min(lease_until) - now()) FROM assignment WHERE status = 'leased'")
+    wait = cur.fetchone()[0]
+    return None if wait is None else float(wait)
+
+def expire_due(cur) -> int:
+    cur.execute("""
+        UPDATE assignment a
+           SET status='expired', worker_id=NULL, lease_until=NULL, updated_at=now()
+         WHERE a.status='leased' AND a.lease_until < now();
+    """)
+    return cur.rowcount
+
+def listen():
+    # LISTEN precisa de uma conexão fixa em autocommit, fora do pool
+    conn = psycopg2.connect(os.environ["DB_URL"])
+    conn.autocommit = True
+    with conn.cursor() as cur: cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+    return conn
+
+def wait_notify(conn, timeout:float) -> bool:
+    if select.select([conn], [], [], timeout) == ([], [], []): return False
+    conn.poll()
+    conn.notifies.clear()
+    return True
 
 def run():
+    start_stats_logger(WORKER_ID)
+    lconn = None
     while True:
         try:
-            with psycopg2.connect(DB_URL) as dbc, dbc.cursor() as cur:
-                cur.execute("""
-                    UPDATE assignment a
-                       SET status='expired', worker_id=NULL, lease_until=NULL, updated_at=now()
-                     WHERE a.status='leased' AND a.lease_until < now();
-                """)
-                print(f"[{WORKER_ID}] expired rows={cur.rowcount}", flush=True)
+            if lconn is None: lconn = listen()
+            with POOL.cursor() as cur:
+                wait = next_deadline(cur)
+                if wait is not None and wait <= 0:
+                    n = expire_due(cur)
+                    if n: print(f"[{WORKER_ID}] expired rows={n}", flush=True)
+                    wait = next_deadline(cur)
+            timeout = MAX_SLEEP if wait is None else min(MAX_SLEEP, max(0.0, wait) + 0.05)
+            wait_notify(lconn, timeout)
         except Exception as e:
             print(f"[{WORKER_ID}] ERRO JANITOR: {e}\n{traceback.format_exc()}", flush=True)
-        time.sleep(INTERVAL)
+            if lconn is not None:
+                try: lconn.close()
+                except Exception: pass
+            lconn = None
+            time.sleep(1)
 
 if __name__ == "__main__":
     run()
@@ -0,0 +1,38 @@
+import threading, time
+
+# Tabela em memória dos leases que este worker segura: (camera_id, detection_type_id) -> prazo.
+# O prazo é guardado em relógio monotônico local a partir do TTL calculado pelo banco
+# (lease_until - now()), então não depende do relógio da máquina bater com o do Postgres.
+
+class LeaseTable:
+    def __init__(self):
+        self._leases = {}
+        self._lock = threading.Lock()
+
+    def set(self, key:tuple, ttl_sec:float):
+        with self._lock: self._leases[key] = time.monotonic() + float(ttl_sec)
+
+    def drop(self, key:tuple):
+        with self._lock: self._leases.pop(key, None)
+
+    def keys(self) -> list:
+        with self._lock: return list(self._leases)
+
+    def __len__(self):
+        return len(self._leases)
+
+    def renewed(self, asked:list, rows:list) -> list:
+        """Aplica o resultado do UPDATE ... RETURNING; devolve as chaves que não voltaram (lease perdido)."""
+        now = time.monotonic()
+        got = {(cam, det): ttl for cam, det, ttl in rows}
+        lost = []
+        with self._lock:
+            for key in asked:
+                if key in got: self._leases[key] = now + float(got[key])
+                elif key in self._leases:
+                    del self._leases[key]; lost.append(key)
+        return lost
+
+    def time_to_expiry(self) -> dict:
+        now = time.monotonic()
+        with self._lock: return {key: round(exp - now, 1) for key, exp in self._leases.items()}
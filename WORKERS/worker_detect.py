@@ -0,0 +1,171 @@
+import json, os, time, random, socket, traceback, threading
+import pika
+from dbpool import get_pool, start_stats_logger
+from det_types import DET_TYPES, preload as preload_det_types
+from leases import LeaseTable
+
+BROKER_URL = os.environ["BROKER_URL"]
+WORKER_ID  = os.environ.get("WORKER_ID", f"detect-{socket.gethostname()}")
+
+# classes atendidas por este processo (ex.: "person,car,dog,bicycle")
+TYPES = [t.strip() for t in os.getenv("DETECTION_TYPES", "person,car").split(",") if t.strip()]
+
+RENEW_EVERY_SEC = int(os.getenv("RENEW_EVERY_SEC", "5"))
+LEASE_EXT_SEC   = int(os.getenv("LEASE_EXT_SEC", "20"))
+RENEW_JITTER    = float(os.getenv("RENEW_JITTER", "0.2"))      # ±20% no intervalo de renovação
+LEASE_REPORT_SEC = int(os.getenv("LEASE_REPORT_SEC", "60"))    # log do tempo até expirar de cada lease
+PREFETCH        = int(os.getenv("WORKER_PREFETCH", "3"))
+
+# msgs de controle vão por exchange topic com routing key det.<ação>.<classe>;
+# cada classe tem a sua fila, então ninguém consome (e descarta) msg de outra classe
+CONTROL_EXCHANGE = os.getenv("CONTROL_EXCHANGE", "det.control")
+
+POOL = get_pool()
+LEASES = LeaseTable()
+
+def upsert_assignment_start(cur, camera_id:int, det_name:str, lease_ttl:int):
+    det_id = DET_TYPES.get_id(cur, det_name)
+    cur.execute("""
+        INSERT INTO assignment(camera_id, detection_type_id, worker_id, lease_until, status)
+        VALUES (%s, %s, %s, now() + (%s || ' sec')::interval, 'leased')
+        ON CONFLICT (camera_id, detection_type_id) DO UPDATE
+          SET worker_id=EXCLUDED.worker_id,
+              lease_until=EXCLUDED.lease_until,
+              status='leased',
+              updated_at=now()
+        RETURNING EXTRACT(EPOCH FROM lease_until - now())
+    """, (camera_id, det_id, WORKER_ID, lease_ttl))
+    LEASES.set((camera_id, det_id), cur.fetchone()[0])
+
+def upsert_assignment_stop(cur, camera_id:int, det_name:str):
+    det_id = DET_TYPES.get_id(cur, det_name)
+    cur.execute("""
+        INSERT INTO assignment(camera_id, detection_type_id, worker_id, lease_until, status)
+        VALUES (%s, %s, NULL, NULL, 'stopped')
+        ON CONFLICT (camera_id, detection_type_id) DO UPDATE
+          SET worker_id=NULL,
+              lease_until=NULL,
+              status='stopped',
+              updated_at=now()
+    """, (camera_id, det_id))
+    LEASES.drop((camera_id, det_id))
+
+def upsert_subscription_params(cur, camera_id:int, det_name:str, params:dict):
+    det_id = DET_TYPES.get_id(cur, det_name)
+    cur.execute("""
+        INSERT INTO camera_subscription(camera_id, detection_type_id, params, enabled)
+        VALUES (%s, %s, %s::jsonb, TRUE)
+        ON CONFLICT (camera_id, detection_type_id) DO UPDATE
+          SET params = camera_subscription.params || EXCLUDED.params,
+              updated_at = now()
+    """, (camera_id, det_id, json.dumps(params)))
+
+def load_leases():
+    # após restart, retoma os leases que ainda estão no nome deste worker
+    with POOL.cursor() as cur:
+        cur.execute("""
+            SELECT camera_id, detection_type_id, EXTRACT(EPOCH FROM lease_until - now())
+              FROM assignment
+             WHERE worker_id = %s AND status = 'leased' AND detection_type_id = ANY(%s)
+        """, (WORKER_ID, [DET_TYPES.get_id(cur, t) for t in TYPES]))
+        for cam, det_id, ttl in cur.fetchall(): LEASES.set((cam, det_id), ttl)
+    print(f"[worker:{WORKER_ID}] leases retomados: {len(LEASES)}", flush=True)
+
+def renew_leases():
+    keys = LEASES.keys()
+    if not keys: return  # nada alocado: não toca no banco
+    with POOL.cursor() as cur:
+        cur.execute("""
+            UPDATE assignment a
+            SET lease_until = GREATEST(a.lease_until, now()) + (%s || ' sec')::interval,
+                updated_at = now()
+            FROM unnest(%s::int[], %s::int[]) AS k(camera_id, detection_type_id)
+            WHERE a.camera_id = k.camera_id
+              AND a.detection_type_id = k.detection_type_id
+              AND a.worker_id = %s
+              AND a.status = 'leased'
+            RETURNING a.camera_id, a.detection_type_id, EXTRACT(EPOCH FROM a.lease_until - now())
+        """, (LEASE_EXT_SEC, [k[0] for k in keys], [k[1] for k in keys], WORKER_ID))
+        rows = cur.fetchall()
+    for cam, det_id in LEASES.renewed(keys, rows):
+        print(f"[worker:{WORKER_ID}] lease perdido camera={cam} detection_type_id={det_id}", flush=True)
+
+def report_leases():
+    tte = LEASES.time_to_expiry()
+    if not tte: return
+    detail = " ".join(f"{cam}/{det}={s}s" for (cam, det), s in sorted(tte.items()))
+    print(f"[worker:{WORKER_ID}] leases n={len(tte)} min_tte={min(tte.values())}s {detail}", flush=True)
+
+def renew_loop():
+    try: load_leases()
+    except Exception as e: print(f"[worker:{WORKER_ID}] erro ao retomar leases: {e}", flush=True)
+    time.sleep(random.uniform(0, RENEW_EVERY_SEC))  # espalha workers que sobem juntos
+    next_report = time.monotonic() + LEASE_REPORT_SEC
+    while True:
+        try:
+            renew_leases()
+        except Exception as e:
+            DET_TYPES.on_error(e)
+            print(f"[worker:{WORKER_ID}] erro no renew: {e}", flush=True)
+        if LEASE_REPORT_SEC > 0 and time.monotonic() >= next_report:
+            report_leases(); next_report = time.monotonic() + LEASE_REPORT_SEC
+        time.sleep(RENEW_EVERY_SEC * random.uniform(1 - RENEW_JITTER, 1 + RENEW_JITTER))
+
+def make_handler(action:str, handle, det:str):
+    # envelope comum: decodifica, executa numa transação do pool, ack/nack.
+    # a classe vem da fila (det.<ação>.<classe>), não do corpo da msg.
+    def on_msg(chx, method, props, body):
+        try:
+            msg = json.loads(body.decode("utf-8"))
+            cam = int(msg["camera_id"])
+            with POOL.cursor() as cur:
+                info = handle(cur, cam, det, msg)
+            print(f"[worker:{WORKER_ID}] {action} {det} camera={cam} -> {info}", flush=True)
+            chx.basic_ack(delivery_tag=method.delivery_tag)
+        except Exception as e:
+            DET_TYPES.on_error(e)
+            print(f"[worker:{WORKER_ID}] ERRO {action}: {e}\n{traceback.format_exc()}", flush=True)
+            chx.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+    return on_msg
+
+def handle_start(cur, cam:int, det:str, msg:dict):
+    ttl = int(msg.get("lease_ttl_sec", 60))
+    upsert_assignment_start(cur, cam, det, ttl)
+    return f"ASSIGN ok ttl={ttl}s"
+
+def handle_stop(cur, cam:int, det:str, msg:dict):
+    upsert_assignment_stop(cur, cam, det)
+    return "stopped"
+
+def handle_params(cur, cam:int, det:str, msg:dict):
+    params = msg.get("params") or {k.replace('-','_'):v for k,v in msg.items() if k in ("threshold","max_fps")}
+    upsert_subscription_params(cur, cam, det, params)
+    return f"merged {params}"
+
+def main():
+    if not TYPES: raise SystemExit("DETECTION_TYPES vazio")
+    threading.Thread(target=renew_loop, daemon=True).start()
+    start_stats_logger(f"worker:{WORKER_ID}")
+    preload_det_types(POOL, f"worker:{WORKER_ID}")
+    params = pika.URLParameters(BROKER_URL)
+    while True:
+        try:
+            conn = pika.BlockingConnection(params)
+            ch = conn.channel()
+            ch.basic_qos(prefetch_count=PREFETCH)
+            ch.exchange_declare(exchange=CONTROL_EXCHANGE, exchange_type="topic", durable=True)
+            handlers = {"start": handle_start, "stop": handle_stop, "params": handle_params}
+            for det in TYPES:
+                for action, handle in handlers.items():
+                    q = f"det.{action}.{det}"
+                    ch.queue_declare(queue=q, durable=True)
+                    ch.queue_bind(queue=q, exchange=CONTROL_EXCHANGE, routing_key=q)
+                    ch.basic_consume(queue=q, on_message_callback=make_handler(action.upper(), handle, det), auto_ack=False)
+            print(f"[worker:{WORKER_ID}] aguardando det.{{start,stop,params}}.{{{','.join(TYPES)}}} via {CONTROL_EXCHANGE}", flush=True)
+            ch.start_consuming()
+        except Exception as e:
+            print(f"[worker:{WORKER_ID}] conexão perdida: {e}; retry em 1s", flush=True)
+            time.sleep(1)
+
+if __name__ == "__main__":
+    main()